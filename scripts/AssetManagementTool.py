@@ -1,13 +1,12 @@
 import bpy
 import sys
 import json
-import hashlib
-import zipfile
 import zlib
+import hashlib
 import tempfile
 
-from os import listdir, chdir, remove
-from os.path import isfile, isdir, join, basename, dirname, splitext, exists
+from os import listdir, chdir, remove, replace
+from os.path import isfile, isdir, join, basename, dirname, splitext, exists, relpath, getsize
 from shutil import copyfile
 
 from bpy.types import Panel, Operator, PropertyGroup
@@ -17,10 +16,29 @@ from mathutils import Vector, Matrix
 from ftplib import FTP_TLS
 from io import BytesIO, StringIO
 from datetime import date
+from math import ceil
+from time import perf_counter
 
-import subprocess
 import threading
 
+import numpy as np
+
+# make the lol helper package next to this script importable, also when run from the text editor
+if isfile(__file__):
+    script_dir = dirname(__file__)
+else:
+    script_dir = dirname(bpy.path.abspath(bpy.context.space_data.text.filepath))
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from lol import thumbnails, collect, catalog, compress, cost, delta, pack, proxy, repo, trace
+from lol import ftp as lol_ftp
+from lol.files import hash_file
+from lol.toc import toc_filename, typepath, iter_toc
+from lol.watch import DropFolderWatcher
+from lol.split import SplitCache
+from lol.store import CatalogStore, CatalogCache, NEW, file_key
+
 # Icons    
 EXPANDABLE_CLOSED = "TRIA_RIGHT"
 EXPANDABLE_OPENED = "TRIA_DOWN"
@@ -35,7 +53,37 @@ CLEAR = "X"  # x sign, used to clear a link (e.g. the world volume)
 
 version = 'v2.5'  
 
+WATCH_INTERVAL = 1.0  # seconds between two polls of the drop folder
+drop_folder_watcher = None
+
+SYNC_INTERVAL = 0.5  # seconds between two checks whether the repository update finished
+repo_sync_thread = None
+
+# The catalog of the current TOC. Only the assets of the shown page get a
+# LuxCoreOnlineLibraryAsset PropertyGroup, edits are written back to the store.
+ASSETS_PER_PAGE = 25
+catalog_store = CatalogStore()
+# stores of the TOC files loaded in this session, switching the asset type only re-reads changed files
+catalog_cache = CatalogCache()
+
+# A TOC is parsed in steps of TOC_LOAD_BUDGET seconds from a timer, the first
+# page is shown as soon as its entries are in.
+TOC_LOAD_BUDGET = 0.02
+toc_loader = None
+# TOC file whose loading failed, its partial catalog must not be published
+toc_load_failed = None
+
+# render cost of the assets found in the drop folder by blend hash, moved into the catalog when they are added
+new_asset_costs = {}
+
+TRACE_SUMMARY_ROWS = 15
+
 def calc_bbox(objects):
+    with trace.span('calc_bbox', items=len(objects)):
+        return _calc_bbox(objects)
+
+
+def _calc_bbox(objects):
     bbox_min = [10000, 10000, 10000]
     bbox_max = [-10000, -10000, -10000]
 
@@ -58,15 +106,110 @@ def calc_bbox(objects):
     return (bbox_min, bbox_max)
 
 
+def calc_cost(objects, materials, blendpath):
+    with trace.span('calc_cost', items=len(objects) + len(materials)):
+        return _calc_cost(objects, materials, blendpath)
+
+
+def _node_tree_images(node_tree, images, node_trees):
+    # images of the nodes in node_tree and its node groups
+    if node_tree is None or node_tree in node_trees:
+        return
+    node_trees.add(node_tree)
+    for node in node_tree.nodes:
+        if getattr(node, 'image', None) is not None:
+            images.add(node.image)
+        _node_tree_images(getattr(node, 'node_tree', None), images, node_trees)
+
+
+def _calc_cost(objects, materials, blendpath):
+    # see lol/cost.py, materials are taken from the objects if there are objects
+    triangles = 0
+    materials = set(materials)
+    for obj in objects:
+        if obj.type == 'MESH':
+            loop_totals = np.empty(len(obj.data.polygons), np.int32)
+            obj.data.polygons.foreach_get('loop_total', loop_totals)
+            triangles += int(loop_totals.sum()) - 2 * len(loop_totals)
+        materials.update(slot.material for slot in obj.material_slots if slot.material is not None)
+
+    images = set()
+    node_trees = set()
+    for mat in materials:
+        _node_tree_images(mat.node_tree, images, node_trees)
+        # BlendLuxCore keeps the LuxCore nodes in a node tree of its own
+        _node_tree_images(getattr(getattr(mat, 'luxcore', None), 'node_tree', None), images, node_trees)
+
+    texture_bytes = 0
+    for img in images:
+        width, height = img.size
+        texture_bytes += cost.texture_bytes(width, height, img.channels, img.is_float)
+
+    result = {'materials': len(materials), 'textures': len(images), 'texture_bytes': texture_bytes, 'blend_size': getsize(blendpath)}
+    if objects:
+        result['triangles'] = triangles
+        result['objects'] = len(objects)
+    return result
+
+
+# properties which change without a change of the data written to a blend
+FINGERPRINT_SKIP = {'rna_type', 'id_data', 'original', 'users', 'session_uid', 'tag', 'is_evaluated',
+                    'is_runtime_data', 'is_dirty', 'is_missing', 'preview', 'pixels', 'bindcode',
+                    'name_full', 'library_weak_reference', 'override_library', 'texture_paint_images',
+                    'texture_paint_slots', 'dimensions'}
+
+
+def _fingerprint_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    try:
+        # arrays, vectors, colors and matrices
+        return [_fingerprint_value(item) for item in value]
+    except TypeError:
+        return str(value)
+
+
+def _fingerprint_rna(digest, data, seen):
+    key = (data.bl_rna.identifier, data.as_pointer())
+    digest.update(data.bl_rna.identifier.encode())
+    if key in seen:
+        return
+    seen.add(key)
+
+    for prop in data.bl_rna.properties:
+        if prop.identifier in FINGERPRINT_SKIP:
+            continue
+        try:
+            value = getattr(data, prop.identifier)
+        except (AttributeError, RuntimeError):
+            continue
+        digest.update(prop.identifier.encode())
+        if prop.type == 'POINTER':
+            if value is not None:
+                _fingerprint_rna(digest, value, seen)
+        elif prop.type == 'COLLECTION':
+            for item in value:
+                _fingerprint_rna(digest, item, seen)
+        elif isinstance(value, bytes):
+            # packed files
+            digest.update(value)
+        else:
+            digest.update(repr(_fingerprint_value(value)).encode())
+
+
+def datablock_fingerprint(datablock):
+    # sha256 of the properties of a datablock and of everything it refers to (node trees, nodes,
+    # images, add-on properties), stable between sessions unlike the bytes of a written blend
+    digest = hashlib.sha256()
+    _fingerprint_rna(digest, datablock, set())
+    return digest.hexdigest()
+
+
 def calc_hash(filename):
-    BLOCK_SIZE = 65536 
-    file_hash = hashlib.sha256() 
-    with open(filename, 'rb') as file: 
-        block = file.read(BLOCK_SIZE)
-        while len(block) > 0:
-            file_hash.update(block)
-            block = file.read(BLOCK_SIZE)
-    return file_hash.hexdigest()  
+    with trace.span('calc_hash', bytes=getsize(filename)):
+        return hash_file(filename)
 
 
 def settings_toggle_icon(enabled):
@@ -85,7 +228,7 @@ def switch_assettype(self, context):
 
 
 def switch_assetsorttype(self, context):
-    ui_props = context.scene.editAsset
+    refresh_asset_proxies(context)
 
 
 def switch_blendermarket(self, context): 
@@ -101,34 +244,265 @@ def switch_blendermarket(self, context):
 def update_filepath(self, context):
     ui_props = context.scene.editAsset
     ui_props.new_assets.clear()
+    update_watch_filepath(self, context)
+
+
+def update_trace_enabled(self, context):
+    trace.enable(context.scene.editAsset.trace_enabled)
+
+
+def update_watch_filepath(self, context):
+    global drop_folder_watcher
+    ui_props = context.scene.editAsset
+
+    if drop_folder_watcher is not None:
+        drop_folder_watcher.close()
+        drop_folder_watcher = None
+
+    filepath = bpy.path.abspath(ui_props.filepath)
+    if ui_props.watch_filepath and isdir(filepath):
+        drop_folder_watcher = DropFolderWatcher(filepath)
+        if not bpy.app.timers.is_registered(watch_filepath_timer):
+            bpy.app.timers.register(watch_filepath_timer, first_interval=WATCH_INTERVAL)
+
+
+def watch_filepath_timer():
+    ui_props = bpy.context.scene.editAsset
+    if drop_folder_watcher is None or not ui_props.watch_filepath:
+        return None
+
+    # only blends which were created or modified since the last poll are loaded
+    count = 0
+    failed = 0
+    for path in drop_folder_watcher.poll():
+        dir = relpath(dirname(path), drop_folder_watcher.filepath)
+        if dir == '.':
+            dir = ''
+
+        # a corrupt or half written blend must not stop the timer, it is loaded again when it changes
+        try:
+            for asset in load_blend(drop_folder_watcher.filepath, dir, basename(path)):
+                # material packs are split into one blend per material, these are no new drops
+                drop_folder_watcher.acknowledge(join(drop_folder_watcher.filepath, dir, splitext(asset['url'])[0]+'.blend'))
+                add_new_asset(ui_props.new_assets, asset)
+                count += 1
+        except Exception as error:
+            print('Watch path: loading {0} failed: {1}'.format(path, error))
+            ui_props.messages.append('{0}: {1}'.format(basename(path), error))
+            failed += 1
+
+    if count:
+        print('Watch path: {0} assets added'.format(count))
+    if count or failed:
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                area.tag_redraw()
+
+    return WATCH_INTERVAL
 
 
 def update_repopath(self, context):
     ui_props = context.scene.editAsset
     
-    if exists(join(ui_props.repopath,'.git')):
+    if repo.is_repository(bpy.path.abspath(ui_props.repopath)):
         ui_props.git_repo = True
-        ui_props.progress_info = 'Updating repository'
-        
-        chdir(ui_props.repopath)
+        start_repo_sync(context)
 
-        process = subprocess.Popen('git pull', stdout=subprocess.PIPE)
-        process.wait()
 
-        process = subprocess.Popen('git-lfs fetch', stdout=subprocess.PIPE)
-        process.wait()
-        
-        process = subprocess.Popen('git-lfs checkout', stdout=subprocess.PIPE)
-        process.wait()
+def start_repo_sync(context):
+    # git pull and the LFS checkout run in a thread, the TOC is loaded when they are done
+    global repo_sync_thread
+    ui_props = context.scene.editAsset
+
+    if repo_sync_thread is not None and repo_sync_thread.is_alive():
+        return
+
+    ui_props.progress_info = 'Updating repository'
+    repo_sync_thread = threading.Thread(target=repo.sync, args=(bpy.path.abspath(ui_props.repopath),), daemon=True)
+    repo_sync_thread.start()
+    bpy.app.timers.register(repo_sync_timer, first_interval=SYNC_INTERVAL)
+
+
+def repo_sync_timer():
+    if repo_sync_thread is not None and repo_sync_thread.is_alive():
+        return SYNC_INTERVAL
+
+    bpy.context.scene.editAsset.progress_info = ''
+    bpy.ops.scene.luxcore_ol_load_toc_from_git_repository()
+    return None
+
+
+class TOCLoader:
+    # streams the entries of a TOC file into a new catalog store
+    def __init__(self, filepath, asset_type):
+        self.filepath = filepath
+        self.key = file_key(filepath)
+        self.store = CatalogStore(asset_type)
+        self.entries = iter_toc(filepath)
+        self.steps = 0
+
+    def step(self, budget):
+        # parse for about budget seconds, the first step stops after one page. True when done.
+        start = perf_counter()
+        batch = []
+        done = True
+        for entry in self.entries:
+            if not 'date' in entry.keys():
+                entry['date'] = str(date.today())
+            batch.append(entry)
+            if (self.steps == 0 and len(batch) == ASSETS_PER_PAGE) or perf_counter() - start > budget:
+                done = False
+                break
+
+        self.store.extend(batch)
+        self.steps += 1
+        return done
+
+    def close(self):
+        self.entries.close()
+
+
+def start_toc_load(context, filepath):
+    # show the cached store of the TOC or start streaming it in
+    global catalog_store, toc_loader, toc_load_failed
+    ui_props = context.scene.editAsset
+
+    if toc_loader is not None:
+        toc_loader.close()
+        toc_loader = None
+    toc_load_failed = None
+    ui_props.progress_info = ''
+
+    ui_props.assets.clear()
+    ui_props['asset_page'] = 1
+
+    cached = catalog_cache.lookup(filepath)
+    if cached is not None:
+        catalog_store = cached
+        refresh_asset_proxies(context)
+        return
+
+    toc_loader = TOCLoader(filepath, ui_props.asset_type)
+    catalog_store = toc_loader.store
+    ui_props.progress_info = 'Loading {0}'.format(basename(filepath))
+    if not bpy.app.timers.is_registered(toc_load_timer):
+        bpy.app.timers.register(toc_load_timer)
+
+
+def catalog_complete():
+    # operators which add to or publish the catalog need all of it, not only the entries loaded so far
+    return toc_loader is None and toc_load_failed is None
+
+
+def toc_load_timer():
+    global toc_loader, toc_load_failed
+    if toc_loader is None:
+        return None
+    ui_props = bpy.context.scene.editAsset
+    loader = toc_loader
+
+    try:
+        with trace.span('load toc step', file=basename(loader.filepath)) as span:
+            done = loader.step(TOC_LOAD_BUDGET)
+            span.count(items=len(loader.store))
+    except Exception as error:
+        # an uncaught error would unregister the timer silently. The entries loaded so far stay
+        # visible, but publishing the partial catalog would drop the rest of the TOC.
+        loader.close()
+        toc_loader = None
+        toc_load_failed = loader.filepath
+        ui_props.messages.append('{0}: {1}'.format(basename(loader.filepath), error))
+        ui_props.progress_info = 'Loading {0} failed'.format(basename(loader.filepath))
+        return None
+
+    if done:
+        toc_loader = None
+        lost = catalog_cache.insert(loader.filepath, loader.key, loader.store)
+        if lost:
+            ui_props.messages.append('{0}: {1} edited assets are no longer in the changed file, their edits are lost.'.format(
+                basename(loader.filepath), lost))
         ui_props.progress_info = ''
-        chdir('..')
-    
-        bpy.ops.scene.luxcore_ol_load_toc_from_git_repository()
-    
+    else:
+        ui_props.progress_info = 'Loading {0}: {1} assets'.format(basename(loader.filepath), len(loader.store))
 
-def load_assets(filepath):
-    new_assets = []
+    # the first page when its entries are in, again at the end because the sort order changes with every entry
+    if loader.steps == 1 or done:
+        refresh_asset_proxies(bpy.context)
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            area.tag_redraw()
+    return None if done else 0.0
+
+
+def thumbnail_path(context, url):
+    # previews of the BlendLuxCore asset cache, or of the repository if the add-on is not installed
+    ui_props = context.scene.editAsset
+    addon = context.preferences.addons.get('BlendLuxCore')
+    if addon is not None and addon.preferences.global_dir != '':
+        assetpath = join(addon.preferences.global_dir, ui_props.asset_type.lower())
+    else:
+        assetpath = join(bpy.path.abspath(ui_props.repopath), typepath(ui_props.asset_type))
+    return join(assetpath, 'preview', splitext(url)[0] + '.jpg')
+
+
+def refresh_asset_proxies(context):
+    # (re)create the PropertyGroups for the assets of the current page
+    ui_props = context.scene.editAsset
+
+    rows = catalog_store.sorted_rows(ui_props.asset_sorttype)
+    pages = max(1, ceil(len(rows) / ASSETS_PER_PAGE))
+    if ui_props.asset_page > pages:
+        ui_props['asset_page'] = pages
+    start = (ui_props.asset_page - 1) * ASSETS_PER_PAGE
+
+    expanded = {asset.row for asset in ui_props.assets if asset.show_settings}
+    ui_props.assets.clear()
 
+    # item assignment does not call the update functions, nothing is written back while filling
+    for row in rows[start:start + ASSETS_PER_PAGE]:
+        row = int(row)
+        asset = catalog_store.get(row)
+        proxy = ui_props.assets.add()
+        proxy['row'] = row
+        proxy['name'] = asset['name']
+        proxy['url'] = asset['url']
+        proxy['category'] = asset['category']
+        proxy['hash'] = asset['hash']
+        proxy['date'] = asset['date']
+        if ui_props.asset_type == 'MODEL':
+            proxy['bbox_min'] = asset['bbox_min']
+            proxy['bbox_max'] = asset['bbox_max']
+        if catalog_store.is_new(row):
+            proxy['new'] = True
+        proxy['show_settings'] = row in expanded
+
+        tpath = catalog_store.thumbnails.get(row, thumbnail_path(context, asset['url']))
+        if exists(tpath):
+            img = bpy.data.images.load(tpath, check_existing=True)
+            img.name = '.LOL_preview'
+            proxy['thumbnail'] = img
+
+
+def update_asset_page(self, context):
+    refresh_asset_proxies(context)
+
+
+def update_asset_proxy(key):
+    # update function which writes a field of a shown asset back to the catalog store
+    def update(self, context):
+        if self.row < 0:
+            return
+        value = getattr(self, key)
+        if key in ('bbox_min', 'bbox_max'):
+            value = list(value)
+        elif key == 'thumbnail':
+            value = value.filepath if value is not None else ''
+        with catalog_store.transaction('Edit ' + key):
+            catalog_store.set(self.row, key, value)
+    return update
+
+
+def find_blendfiles(filepath):
     subdir = []
     subdir.append('')
     
@@ -136,129 +510,225 @@ def load_assets(filepath):
     for dir in [file for file in listdir(filepath) if isdir(join(filepath, file))]:
         subdir.append(dir)
 
-
+    blendfiles = []
     for dir in subdir:
         for blendfile in [file for file in listdir(join(filepath, dir)) if isfile(join(filepath, dir, file)) and splitext(file)[1] == '.blend']:
-            if ui_props.asset_type == 'MODEL':
-                with bpy.data.libraries.load(join(filepath, dir, blendfile), link=True) as (data_from, data_to):
-                    data_to.objects = [name for name in data_from.objects]
-            elif ui_props.asset_type == 'MATERIAL':
-                with bpy.data.libraries.load(join(filepath, dir, blendfile), link=False) as (data_from, data_to):
-                    data_to.materials = [name for name in data_from.materials]
+            blendfiles.append((dir, blendfile))
+    return blendfiles
+
+
+def split_materials(filepath, materials, previous):
+    # Write one blend per material. previous has the {name: (path, hash, fingerprint)} of the
+    # unchanged files of the last split, a material with the same fingerprint keeps its file,
+    # it is neither written nor read again and is not picked up as a new drop.
+    result = {}
+    for mat in materials:
+        fingerprint = datablock_fingerprint(mat)
+        if mat.name in previous and previous[mat.name][2] == fingerprint:
+            result[mat.name] = previous[mat.name]
+            continue
+
+        path = join(filepath, mat.name+'.blend')
+        temp_path = join(filepath, mat.name+'.blend.tmp')
+        with trace.span('libraries.write', material=mat.name):
+            bpy.data.libraries.write(temp_path, {mat}, fake_user = True)
+        replace(temp_path, path)
+        result[mat.name] = (path, calc_hash(path), fingerprint)
+    return result
+
+
+def load_blend(filepath, dir, blendfile):
+    ui_props = bpy.context.scene.editAsset
+    new_assets = []
+
+    if ui_props.asset_type == 'MODEL':
+        with trace.span('libraries.load', file=blendfile), \
+                bpy.data.libraries.load(join(filepath, dir, blendfile), link=True) as (data_from, data_to):
+            data_to.objects = [name for name in data_from.objects]
+
+        hash = calc_hash(join(filepath, dir, blendfile))
         
-            hash = calc_hash(join(filepath, dir, blendfile))
-            
-            if ui_props.asset_type == 'MODEL':
-                asset = {}
-                asset['name'] = splitext(blendfile)[0].replace('_',' ') 
-                (bbox_min, bbox_max) = calc_bbox(data_to.objects)
-                asset['bbox_min'] = bbox_min
-                asset['bbox_max'] = bbox_max
-                if dir == '':
-                    asset['category'] = 'Misc'
-                else:
-                    asset['category'] = dir
-                
-                asset['url'] = splitext(blendfile)[0]+'.zip'
-                asset['hash'] = hash
-                asset['date'] = str(date.today())
-                tpath = join(filepath, dir, splitext(blendfile)[0] + '.jpg')
-
-                img = None
-                if exists(tpath):
-                    img = bpy.data.images.load(tpath)
-                    img.name = '.LOL_preview'
-
-                asset['thumbnail'] = img
-                new_assets.append(asset)
-                bpy.ops.object.delete()  
-                leftOverObjBlocks = [block for block in bpy.data.objects if block.users == 0]
-                for block in leftOverObjBlocks:
-                    bpy.data.objects.remove(block)
-
-                leftOverMeshBlocks = [block for block in bpy.data.meshes if block.users == 0]
-                for block in leftOverMeshBlocks:
-                    bpy.data.meshes.remove(block)
+        asset = {}
+        asset['name'] = splitext(blendfile)[0].replace('_',' ') 
+        (bbox_min, bbox_max) = calc_bbox(data_to.objects)
+        asset['bbox_min'] = bbox_min
+        asset['bbox_max'] = bbox_max
+        if dir == '':
+            asset['category'] = 'Misc'
+        else:
+            asset['category'] = dir
+        
+        asset['url'] = splitext(blendfile)[0]+'.zip'
+        asset['hash'] = hash
+        asset['date'] = str(date.today())
+        asset['cost'] = calc_cost(data_to.objects, [], join(filepath, dir, blendfile))
+        tpath = join(filepath, dir, splitext(blendfile)[0] + '.jpg')
+
+        img = None
+        if exists(tpath):
+            img = bpy.data.images.load(tpath)
+            img.name = '.LOL_preview'
+
+        asset['thumbnail'] = img
+        new_assets.append(asset)
+        bpy.ops.object.delete()  
+        leftOverObjBlocks = [block for block in bpy.data.objects if block.users == 0]
+        for block in leftOverObjBlocks:
+            bpy.data.objects.remove(block)
+
+        leftOverMeshBlocks = [block for block in bpy.data.meshes if block.users == 0]
+        for block in leftOverMeshBlocks:
+            bpy.data.meshes.remove(block)
 
  
-            elif ui_props.asset_type == 'MATERIAL':
-                if len(data_to.materials) > 1:
-                    for mat in data_to.materials:
-                        bpy.data.libraries.write(join(filepath, dir, mat.name+".blend"), {mat}, fake_user = True)
-                        hash = calc_hash(join(filepath, dir, mat.name+".blend"))
-                        
-                        asset = {}
-                        asset['name'] = mat.name
-                        asset['url'] = mat.name+'.zip'
-                        if dir == '':
-                            asset['category'] = mat.name.split('_')[0]
-                        else:
-                            asset['category'] = dir
-                        
-                        asset['hash'] = hash
-                        asset['date'] = str(date.today())
-                        
-                        tpath = join(filepath, dir, mat.name + '.jpg')
-
-                        img = None
-                        if exists(tpath):
-                            img = bpy.data.images.load(tpath)
-                            img.name = '.LOL_preview'
-
-                        asset['thumbnail'] = img
-                        new_assets.append(asset)
-                        mat.user_clear()
-                else:
-                    mat = data_to.materials[0]
-                    asset = {}
-                    asset['name'] = mat.name
-                    asset['url'] = mat.name+'.zip'
-                    if dir == '':
-                        asset['category'] = mat.name.split('_')[0]
-                    else:
-                        asset['category'] = dir
-                    
-                    asset['hash'] = hash
-                    asset['date'] = str(date.today())
-                    
-                    tpath = join(filepath, dir, mat.name + '.jpg')
+    elif ui_props.asset_type == 'MATERIAL':
+        blendpath = join(filepath, dir, blendfile)
+        split_cache = SplitCache(filepath)
+        hashes = split_cache.lookup(blendpath)
+
+        # the blend and the blends split from it are unchanged, no need to load anything
+        if hashes is None:
+            with trace.span('libraries.load', file=blendfile), \
+                    bpy.data.libraries.load(blendpath, link=False) as (data_from, data_to):
+                data_to.materials = [name for name in data_from.materials]
+
+            if len(data_to.materials) > 1:
+                materials = split_materials(join(filepath, dir), data_to.materials, split_cache.previous(blendpath))
+            else:
+                materials = {data_to.materials[0].name: (blendpath, calc_hash(blendpath), None)}
+            costs = {mat.name: calc_cost([], [mat], materials[mat.name][0]) for mat in data_to.materials}
 
-                    img = None
-                    if exists(tpath):
-                        img = bpy.data.images.load(tpath)
-                        img.name = '.LOL_preview'
+            split_cache.store(blendpath, materials, costs)
+            split_cache.save()
+            hashes = {name: hash for name, (path, hash, fingerprint) in materials.items()}
 
-                    asset['thumbnail'] = img
-                    new_assets.append(asset)
-                    mat.user_clear()
-                    
-        
-                leftOverMatBlocks = [block for block in bpy.data.materials if block.users == 0]
-                for block in leftOverMatBlocks:
-                    bpy.data.materials.remove(block)
+            for mat in data_to.materials:
+                mat.user_clear()
 
+            leftOverMatBlocks = [block for block in bpy.data.materials if block.users == 0]
+            for block in leftOverMatBlocks:
+                bpy.data.materials.remove(block)
+        else:
+            costs = split_cache.costs(blendpath)
+
+        for name, hash in hashes.items():
+            asset = {}
+            asset['name'] = name
+            asset['url'] = name+'.zip'
+            if dir == '':
+                asset['category'] = name.split('_')[0]
+            else:
+                asset['category'] = dir
+            
+            asset['hash'] = hash
+            asset['date'] = str(date.today())
+            if name in costs:
+                asset['cost'] = costs[name]
+            
+            tpath = join(filepath, dir, name + '.jpg')
+
+            img = None
+            if exists(tpath):
+                img = bpy.data.images.load(tpath)
+                img.name = '.LOL_preview'
+
+            asset['thumbnail'] = img
+            new_assets.append(asset)
+
+    return new_assets
+
+
+def load_assets(filepath):
+    new_assets = []
+    for (dir, blendfile) in find_blendfiles(filepath):
+        with trace.span('load_blend', file=blendfile) as span:
+            new_assets += load_blend(filepath, dir, blendfile)
+            span.count(bytes=getsize(join(filepath, dir, blendfile)))
     return new_assets
 
 
+def add_new_asset(new_assets_prop, asset):
+    ui_props = bpy.context.scene.editAsset
+
+    # a modified blend replaces the entry found before
+    new_asset = None
+    for prop in new_assets_prop:
+        if prop['name'] == asset['name']:
+            new_asset = prop
+    if new_asset is None:
+        new_asset = new_assets_prop.add()
+
+    new_asset['name'] = asset['name']
+    new_asset['url'] = asset['url']
+    new_asset['category'] = asset['category']
+    new_asset['hash'] =  asset['hash']
+    new_asset['date'] =  asset['date']
+    if ui_props.asset_type == 'MODEL':
+        new_asset['bbox_min'] = asset['bbox_min']
+        new_asset['bbox_max'] = asset['bbox_max']
+    new_asset['thumbnail'] = asset['thumbnail']
+    if 'cost' in asset:
+        new_asset_costs[asset['hash']] = asset['cost']
+    return new_asset
+
+
+def new_asset_entry(new_asset):
+    # the detected asset as dict for add_new_asset, kept with the undo step of adding it
+    asset = {'name': new_asset.name, 'url': new_asset.url, 'category': new_asset.category,
+             'hash': new_asset.hash, 'date': new_asset.date,
+             'bbox_min': list(new_asset.bbox_min), 'bbox_max': list(new_asset.bbox_max)}
+    asset['thumbnail'] = new_asset.thumbnail.filepath if new_asset.thumbnail is not None else None
+    return asset
+
+
+def restore_new_assets(new_assets_prop, assets):
+    # undo of adding detected assets to the catalog, they are listed as new assets again
+    for asset in assets:
+        asset = dict(asset)
+        img = None
+        if asset['thumbnail'] is not None and exists(asset['thumbnail']):
+            img = bpy.data.images.load(asset['thumbnail'], check_existing=True)
+            img.name = '.LOL_preview'
+        asset['thumbnail'] = img
+        add_new_asset(new_assets_prop, asset)
+
+
+def remove_new_assets(new_assets_prop, assets):
+    names = {asset['name'] for asset in assets}
+    for idx in reversed(range(len(new_assets_prop))):
+        if new_assets_prop[idx].name in names:
+            new_assets_prop.remove(idx)
+
+
+def add_catalog_asset(asset, asset_type):
+    entry = catalog.toc_entry(asset, asset_type)
+    entry['date'] = str(date.today())
+    if asset.hash in new_asset_costs:
+        entry['cost'] = dict(new_asset_costs[asset.hash])
+    thumbnail = asset.thumbnail.filepath if asset.thumbnail is not None else None
+    return catalog_store.append(entry, NEW, thumbnail)
+
+
 class LuxCoreOnlineLibraryAsset(bpy.types.PropertyGroup):
-    name: StringProperty(name='Asset name', description='Assign a name to the asset', default='Default')
-    category: StringProperty(name='Category', description='Assign a category to the asset', default='misc')
-    url: StringProperty(name='Url', description='Assign a category to the asset', default='')
-    bbox_min: FloatVectorProperty(name='Bounding Box Min', default=(0, 0, 0))
-    bbox_max: FloatVectorProperty(name='Bounding Box Max', default=(1, 1, 1))
-    hash: StringProperty(name='Hash', description='SHA256 hash number for the asset blendfile', default='')
-    date: StringProperty(name='Date', description='Publishing date', default='')
+    name: StringProperty(name='Asset name', description='Assign a name to the asset', default='Default', update=update_asset_proxy('name'))
+    category: StringProperty(name='Category', description='Assign a category to the asset', default='misc', update=update_asset_proxy('category'))
+    url: StringProperty(name='Url', description='Assign a category to the asset', default='', update=update_asset_proxy('url'))
+    bbox_min: FloatVectorProperty(name='Bounding Box Min', default=(0, 0, 0), update=update_asset_proxy('bbox_min'))
+    bbox_max: FloatVectorProperty(name='Bounding Box Max', default=(1, 1, 1), update=update_asset_proxy('bbox_max'))
+    hash: StringProperty(name='Hash', description='SHA256 hash number for the asset blendfile', default='', update=update_asset_proxy('hash'))
+    date: StringProperty(name='Date', description='Publishing date', default='', update=update_asset_proxy('date'))
     show_settings: BoolProperty(default=False)
     show_thumbnail: BoolProperty(name='', default=True, description='Show thumbnail')
     new: BoolProperty(name='', default=False, description='New Asset')
     deleted: BoolProperty(name='', default=False, description='Deleted Asset')
-    thumbnail: PointerProperty(name='Image', type=bpy.types.Image)
+    thumbnail: PointerProperty(name='Image', type=bpy.types.Image, update=update_asset_proxy('thumbnail'))
+    row: IntProperty(default=-1)  # row in the catalog store, -1 for assets which are not in the catalog
 
 
 class LOLCheckPathOperator(Operator):
     bl_idname = 'scene.luxcore_ol_check_path'
     bl_label = 'LuxCore Online Library Check Path'
-    bl_options = {'REGISTER', 'UNDO', 'INTERNAL'}
+    bl_options = {'REGISTER', 'INTERNAL'}
 
     filepath: StringProperty(name='filepath', default='', options={'SKIP_SAVE'})
       
@@ -274,8 +744,10 @@ class LOLCheckPathOperator(Operator):
         new_assets_prop = ui_props.new_assets
         new_assets_prop.clear()
       
-        new_assets = load_assets(bpy.path.abspath(self.filepath))
-        namelist = [asset['name'] for asset in ui_props.assets]
+        with trace.span('load_assets') as span:
+            new_assets = load_assets(bpy.path.abspath(self.filepath))
+            span.count(items=len(new_assets))
+        namelist = catalog_store.keys()[0]
         
         sorted_assets = sorted(new_assets, key=lambda c: c['name'].lower())
         
@@ -283,16 +755,7 @@ class LOLCheckPathOperator(Operator):
             if asset['name'] in namelist:
                 print('Found in Assets:', asset['name'])
                 
-            new_asset = new_assets_prop.add()
-            new_asset['name'] = asset['name']
-            new_asset['url'] = asset['url']
-            new_asset['category'] = asset['category']
-            new_asset['hash'] =  asset['hash']
-            new_asset['date'] =  asset['date']
-            if ui_props.asset_type == 'MODEL':
-                new_asset['bbox_min'] = asset['bbox_min']
-                new_asset['bbox_max'] = asset['bbox_max']
-            new_asset['thumbnail'] = asset['thumbnail']
+            add_new_asset(new_assets_prop, asset)
                   
         return {'FINISHED'}
 
@@ -300,7 +763,7 @@ class LOLCheckPathOperator(Operator):
 class LOLClearMessagesOperator(Operator):
     bl_idname = 'scene.luxcore_ol_clear_messages'
     bl_label = 'LuxCore Online Library Clear Messages'
-    bl_options = {'REGISTER', 'UNDO', 'INTERNAL'}
+    bl_options = {'REGISTER', 'INTERNAL'}
 
     @classmethod
     def description(cls, context, properties):
@@ -315,7 +778,7 @@ class LOLClearMessagesOperator(Operator):
 class LOLRemoveAssetOperator(Operator):
     bl_idname = 'scene.luxcore_ol_remove_asset'
     bl_label = 'LuxCore Online Library Remove Asset'
-    bl_options = {'REGISTER', 'UNDO', 'INTERNAL'}
+    bl_options = {'REGISTER', 'INTERNAL'}
 
     asset_index: IntProperty(name='asset_index', default=-1, options={'SKIP_SAVE'})
 
@@ -324,19 +787,9 @@ class LOLRemoveAssetOperator(Operator):
         return 'Remove asset from the database'
 
     def execute(self, context):
-        ui_props = context.scene.editAsset
-        
-        if ui_props.asset_sorttype == 'NAME':
-            sorted_assets = sorted(ui_props.assets, key=lambda c: c.name.lower())
-        elif ui_props.asset_sorttype == 'CATEGORY':
-            sorted_assets = sorted(ui_props.assets, key=lambda c: c.name.lower())
-            sorted_assets = sorted(sorted_assets, key=lambda c: c.category.lower())
-        elif ui_props.asset_sorttype == 'NEW':
-            sorted_assets = sorted(ui_props.assets, key=lambda c: c.name.lower())
-            sorted_assets = sorted(sorted_assets, key=lambda c: c.new, reverse=True)
-            
-        asset = sorted_assets[self.asset_index] 
-        asset.deleted = True
+        with catalog_store.transaction('Remove asset'):
+            catalog_store.set_deleted(self.asset_index)
+        refresh_asset_proxies(context)
     
         return {'FINISHED'}
  
@@ -344,7 +797,7 @@ class LOLRemoveAssetOperator(Operator):
 class LOLAddAssetOperator(Operator):
     bl_idname = 'scene.luxcore_ol_add_asset'
     bl_label = 'LuxCore Online Library Add Asset'
-    bl_options = {'REGISTER', 'UNDO', 'INTERNAL'}
+    bl_options = {'REGISTER', 'INTERNAL'}
 
     asset_index: IntProperty(name='asset_index', default=-1, options={'SKIP_SAVE'})
 
@@ -352,39 +805,35 @@ class LOLAddAssetOperator(Operator):
     def description(cls, context, properties):
         return 'Add asset to the database'
 
+    @classmethod
+    def poll(cls, context):
+        return catalog_complete()
+
 
     def execute(self, context):
         ui_props = context.scene.editAsset
     
         asset = ui_props.new_assets[self.asset_index]
-        namelist = [asset['name'] for asset in ui_props.assets if not asset.deleted]
-        hashlist = [asset['hash'] for asset in ui_props.assets if not asset.deleted]
+        (names, hashes) = catalog_store.keys()
+        duplicate = catalog.duplicate(asset, names, hashes, ui_props.asset_type == 'MODEL')
         
         ui_props.messages.clear()
 
-        if asset['hash'] in hashlist and ui_props.asset_type == 'MODEL':
+        if duplicate == 'hash':
             ui_props.messages.append(asset['name'] +': Asset with same hash number is already in database. Asset not added.')
             print(ui_props.messages)
             print('Info ' + asset['name'] +': Asset with same hash number is already in database. Asset not added.')
-        elif asset['name'] in namelist:
+        elif duplicate == 'name':
             ui_props.messages.append(asset['name'] +': Asset with same name is already in database. Asset not added.')
             print('Info ' + asset['name'] +': Asset with same name is already in database. Asset not added.')
         else:
             print('Added ' + asset['name'] + ' to database')
             
-            asset_prop = ui_props.assets.add()
-            asset_prop['name'] = asset['name']
-            asset_prop['url'] = asset['url']
-            asset_prop['category'] = asset['category']
-            if ui_props.asset_type == 'MODEL':
-                asset_prop['bbox_min'] = asset['bbox_min']
-                asset_prop['bbox_max'] = asset['bbox_max']
-            asset_prop['hash'] = asset['hash']
-            asset_prop['date'] = str(date.today())
-            asset_prop['thumbnail'] = asset['thumbnail']
-            asset_prop['new'] = True
+            with catalog_store.transaction('Add asset', [new_asset_entry(asset)]):
+                add_catalog_asset(asset, ui_props.asset_type)
            
             ui_props.new_assets.remove(self.asset_index)
+            refresh_asset_proxies(context)
             
         return {'FINISHED'}
 
@@ -392,78 +841,101 @@ class LOLAddAssetOperator(Operator):
 class LOLAddAllAssetOperator(Operator):
     bl_idname = 'scene.luxcore_ol_add_all_asset'
     bl_label = 'LuxCore Online Library Add All Assets'
-    bl_options = {'REGISTER', 'UNDO', 'INTERNAL'}
+    bl_options = {'REGISTER', 'INTERNAL'}
 
     @classmethod
     def description(cls, context, properties):
         return 'Add all new assets to the database'
 
+    @classmethod
+    def poll(cls, context):
+        return catalog_complete()
+
 
     def execute(self, context):
         ui_props = context.scene.editAsset
     
-        namelist = [asset['name'] for asset in ui_props.assets if not asset.deleted]
-        hashlist = [asset['hash'] for asset in ui_props.assets if not asset.deleted]
+        (names, hashes) = catalog_store.keys()
         
         ui_props.messages.clear()
         
-        for asset in ui_props.new_assets:
-            add_asset = True
-            if asset['hash'] in hashlist:
-                ui_props.messages.append(asset['name'] +': Asset with same hash number is already in database. Asset not added.')
-                print('Info ' + asset['name'] +': Asset with same hash number is already in database. Asset not added.')
-                add_asset = False
-            elif asset['name'] in namelist:
-                ui_props.messages.append(asset['name'] +': Asset with same name is already in database. Update asset.')
-                print('Info ' + asset['name'] +': Asset with same name is already in database. Update asset.')
-            
-            if add_asset:
-                print('Added ' + asset['name'] + ' to database')
+        # all assets are one step of the catalog undo
+        with catalog_store.transaction('Add all assets', [new_asset_entry(asset) for asset in ui_props.new_assets]):
+            for asset in ui_props.new_assets:
+                add_asset = True
+                duplicate = catalog.duplicate(asset, names, hashes)
+                if duplicate == 'hash':
+                    ui_props.messages.append(asset['name'] +': Asset with same hash number is already in database. Asset not added.')
+                    print('Info ' + asset['name'] +': Asset with same hash number is already in database. Asset not added.')
+                    add_asset = False
+                elif duplicate == 'name':
+                    ui_props.messages.append(asset['name'] +': Asset with same name is already in database. Update asset.')
+                    print('Info ' + asset['name'] +': Asset with same name is already in database. Update asset.')
                 
-                asset_prop = ui_props.assets.add()
-                asset_prop['name'] = asset['name']
-                asset_prop['url'] = asset['url']
-                asset_prop['category'] = asset['category']
-                if ui_props.asset_type == 'MODEL':
-                    asset_prop['bbox_min'] = asset['bbox_min']
-                    asset_prop['bbox_max'] = asset['bbox_max']
-                asset_prop['hash'] = asset['hash']
-                asset_prop['date'] = str(date.today())
-                asset_prop['thumbnail'] = asset['thumbnail']
-                asset_prop['new'] = True
+                if add_asset:
+                    print('Added ' + asset['name'] + ' to database')
+                    
+                    add_catalog_asset(asset, ui_props.asset_type)
                    
         ui_props.new_assets.clear()
+        refresh_asset_proxies(context)
             
         return {'FINISHED'}
 
 
+class LOLUndoCatalogOperator(Operator):
+    bl_idname = 'scene.luxcore_ol_undo_catalog'
+    bl_label = 'LuxCore Online Library Undo Catalog Edit'
+    bl_options = {'REGISTER', 'INTERNAL'}
+
+    @classmethod
+    def description(cls, context, properties):
+        return 'Undo the last change of the asset catalog'
+
+    def execute(self, context):
+        step = catalog_store.undo()
+        if step is None:
+            return {'CANCELLED'}
+        label, new_assets = step
+        if new_assets:
+            restore_new_assets(context.scene.editAsset.new_assets, new_assets)
+        refresh_asset_proxies(context)
+        self.report({'INFO'}, 'Undo: ' + label)
+        return {'FINISHED'}
+
+
+class LOLRedoCatalogOperator(Operator):
+    bl_idname = 'scene.luxcore_ol_redo_catalog'
+    bl_label = 'LuxCore Online Library Redo Catalog Edit'
+    bl_options = {'REGISTER', 'INTERNAL'}
+
+    @classmethod
+    def description(cls, context, properties):
+        return 'Redo the last undone change of the asset catalog'
+
+    def execute(self, context):
+        step = catalog_store.redo()
+        if step is None:
+            return {'CANCELLED'}
+        label, new_assets = step
+        if new_assets:
+            remove_new_assets(context.scene.editAsset.new_assets, new_assets)
+        refresh_asset_proxies(context)
+        self.report({'INFO'}, 'Redo: ' + label)
+        return {'FINISHED'}
+
+
 class LOLLoadTOCfromGitRepositoy(Operator):
     bl_idname = 'scene.luxcore_ol_load_toc_from_git_repository'
     bl_label = 'LuxCore Online Library Load TOC from GIT Repository'
-    bl_options = {'REGISTER', 'UNDO', 'INTERNAL'}
+    bl_options = {'REGISTER', 'INTERNAL'}
 
     @classmethod
     def description(cls, context, properties):
         return 'Load TOC from Git Repository'
     
-    def cloneRepository(self, context):
-        import subprocess
-        ui_props = context.scene.editAsset
-        if ui_props.repopath[-1] == '\\':
-            path = ui_props.repopath[:-1]
-        else:
-            path = ui_props.repopath
-        process = subprocess.Popen('git clone https://github.com/LuxCoreRender/LoL.git "' + path + '"', shell=True, stdout=subprocess.PIPE)
-        process.wait()
-
-                
     def execute(self, context):
         ui_props = context.scene.editAsset 
-        assets = ui_props.assets
-        user_preferences = context.preferences.addons['BlendLuxCore'].preferences
-
-        edit_assets_prop = ui_props.assets
-        edit_assets_prop.clear()
         
         if ui_props.blendermarket_assets:
             filename = 'assets_model_blendermarket.json'
@@ -473,35 +945,7 @@ class LOLLoadTOCfromGitRepositoy(Operator):
             filename = 'assets_model.json'
         
         filepath = join(bpy.path.abspath(ui_props.repopath),version, filename)
-        if isfile(filepath):
-            with open(filepath) as file_handle:
-                assets = json.loads(file_handle.read())
-        
-        for asset in assets:
-            new_asset = edit_assets_prop.add()
-            new_asset['name'] = asset['name']
-            new_asset['url'] = asset['url']
-            if 'date' in asset.keys():
-                new_asset['date'] = asset['date']  
-            else:
-                new_asset['date'] = str(date.today())
-            new_asset['url'] = asset['url']
-            
-            new_asset['category'] = asset['category']
-            new_asset['hash'] =  asset['hash']
-            if ui_props.asset_type == 'MODEL':
-                new_asset['bbox_min'] = asset['bbox_min']
-                new_asset['bbox_max'] = asset['bbox_max']
-            
-            assetpath = join(user_preferences.global_dir, ui_props.asset_type.lower())
-            thumbnailname = splitext(new_asset['url'])[0] + '.jpg'
-               
-            tpath = join(assetpath, 'preview', thumbnailname)
-            if exists(tpath):
-                img = bpy.data.images.load(tpath)
-                img.name = '.LOL_preview'
-                asset['thumbnail'] = img
-                new_asset['thumbnail'] = asset['thumbnail']              
+        start_toc_load(context, filepath)
 
         return {'FINISHED'}
 
@@ -509,12 +953,16 @@ class LOLLoadTOCfromGitRepositoy(Operator):
 class LOLUploadTOCOperator(Operator):
     bl_idname = 'scene.luxcore_ol_upload_toc'
     bl_label = 'LuxCore Online Library Upload ToC'
-    bl_options = {'REGISTER', 'UNDO', 'INTERNAL'}
+    bl_options = {'REGISTER', 'INTERNAL'}
 
     @classmethod
     def description(cls, context, properties):
         return 'Upload table of context to the server'
 
+    @classmethod
+    def poll(cls, context):
+        return catalog_complete()
+
     def connect(self, context):
         ui_props = context.scene.editAsset
 
@@ -523,7 +971,26 @@ class LOLUploadTOCOperator(Operator):
         ftp.login(ui_props.username, ui_props.password)
         return ftp
 
-    def uploadToC(self, context, assets):
+    def store(self, ftp, filename, file):
+        with trace.span('storbinary', file=filename) as span:
+            ftp.storbinary(f'STOR {filename}', file)
+            span.count(bytes=file.tell())
+
+    def storeResumable(self, context, ftp, path, file):
+        # upload through a temporary name which is resumed after a dropped connection, returns the connection in use
+        ui_props = context.scene.editAsset
+
+        def progress(done, total, rate):
+            ui_props.progress_info = 'Uploading {0}: {1:.0f}% ({2:.1f} MB/s)'.format(basename(path), 100 * done / max(total, 1), rate / 1024 ** 2)
+            bpy.ops.wm.redraw_timer(type='DRAW_WIN_SWAP', iterations=1)
+
+        with trace.span('upload', file=path) as span:
+            ftp = lol_ftp.upload(ftp, path, file, lambda: self.connect(context), progress)
+            span.count(bytes=file.tell())
+        ui_props.progress_info = ''
+        return ftp
+
+    def uploadToC(self, context, assets, pending=False):
         ui_props = context.scene.editAsset
         
         ftp = self.connect(context)
@@ -538,12 +1005,99 @@ class LOLUploadTOCOperator(Operator):
         else: 
             filename = 'assets_model.json'
         
-        ftp.cwd('/' + version)    
-        ftp.storbinary(f'STOR {filename}', bytestream2)
+        if pending:
+            filename += delta.PENDING_SUFFIX
+        ftp = self.storeResumable(context, ftp, '/' + version + '/' + filename, bytestream2)
         ftp.quit()
         
         
-    def uploadFiles(self, context, assets):
+    def makeDirs(self, ftp, remote_dir):
+        # change to remote_dir, missing directories are created on the way
+        try:
+            ftp.cwd(remote_dir)
+        except lol_ftp.error_perm:
+            path = ''
+            for name in remote_dir.strip('/').split('/'):
+                path += '/' + name
+                try:
+                    ftp.cwd(path)
+                except lol_ftp.error_perm:
+                    ftp.mkd(path)
+                    ftp.cwd(path)
+
+    def storeFiles(self, ftp, ftppath, localpath, files):
+        # files are relative paths, create missing remote subdirectories on the way
+        for filename in files:
+            self.makeDirs(ftp, '/'.join([ftppath] + filename.replace('\\', '/').split('/')[:-1]))
+            with open(join(localpath, filename),'rb') as file:
+                self.store(ftp, basename(filename), file)
+
+    def uploadDelta(self, context, ftp, ftppath, url, blendpath, expected, chunks):
+        # upload the chunks of the blend which are not in chunks yet and its recipe, returns the connection in use
+        ui_props = context.scene.editAsset
+        sent = []
+
+        def store_chunk(sha, data):
+            if sha in chunks:
+                return
+            path = ftppath + '/' + delta.chunk_path(sha)
+            self.makeDirs(ftp, dirname(path))
+            self.store(ftp, basename(path), BytesIO(delta.compress_chunk(data)))
+            chunks.add(sha)
+            sent.append(len(data))
+
+        with trace.span('delta upload', file=url) as span:
+            recipe = delta.make_recipe(blendpath, store_chunk)
+            span.count(bytes=sum(sent), items=len(sent))
+
+        if recipe['hash'] != expected:
+            ui_props.messages.append(url + ': Blend file changed after it was added. Recipe not uploaded.')
+            return ftp
+
+        recipe_path = ftppath + '/' + delta.recipe_path(url)
+        self.makeDirs(ftp, dirname(recipe_path))
+        ftp = self.storeResumable(context, ftp, recipe_path, BytesIO(json.dumps(recipe).encode('utf-8')))
+        print('{0}: {1} of {2} chunks uploaded ({3:.1f} MB)'.format(url, len(sent), len(recipe['chunks']), sum(sent) / 1024 ** 2))
+        return ftp
+
+    def uploadPacks(self, context, ftp, ftppath, filename, index):
+        # only packs whose digest differs from the index on the server, returns the connection in use
+        ui_props = context.scene.editAsset
+        local_dir = join(ui_props.repopath, ftppath[1:], pack.pack_dir(filename))
+        remote_dir = ftppath + '/' + pack.pack_dir(filename).replace('\\', '/')
+
+        try:
+            remote_index = json.loads(lol_ftp.read_file(ftp, remote_dir + '/' + pack.PACK_INDEX).decode('utf-8'))
+        except lol_ftp.error_perm:
+            remote_index = {'packs': {}}
+
+        self.makeDirs(ftp, remote_dir)
+        for name, entry in sorted(index['packs'].items()):
+            if remote_index['packs'].get(name, {}).get('sha256') != entry['sha256']:
+                with open(join(local_dir, name), 'rb') as file:
+                    ftp = self.storeResumable(context, ftp, remote_dir + '/' + name, file)
+
+        # the index comes last, readers never see entries of packs which are not uploaded yet
+        with open(join(local_dir, pack.PACK_INDEX), 'rb') as file:
+            ftp = self.storeResumable(context, ftp, remote_dir + '/' + pack.PACK_INDEX, file)
+        return ftp
+
+    def uploadPreviews(self, context, ftp, ftppath, url, thumbnail):
+        ui_props = context.scene.editAsset
+        stem = splitext(url)[0]
+        preview_dir = join(ui_props.repopath, ftppath[1:], 'preview')
+
+        # upload the preview with its variants from the repository if the pipeline created them
+        if thumbnails.available() and thumbnails.is_current(join(preview_dir, stem+'.jpg'), preview_dir, stem):
+            self.storeFiles(ftp, ftppath+'/preview', preview_dir, thumbnails.preview_files(stem))
+        elif thumbnail is None:
+            ui_props.messages.append(stem + ': Asset has no preview image. Preview not uploaded.')
+        else:
+            ftp.cwd(ftppath+'/preview')
+            with open(thumbnail,'rb') as file:
+                self.store(ftp, stem+'.jpg', file)
+
+    def uploadFiles(self, context, store):
         ui_props = context.scene.editAsset
         
         if ui_props.asset_type == 'MATERIAL':
@@ -553,40 +1107,70 @@ class LOLUploadTOCOperator(Operator):
         
         ftp = self.connect(context)
 
+        if ui_props.delta_upload:
+            chunk_index_path = ftppath + '/' + delta.CHUNK_DIR + '/' + delta.CHUNK_INDEX
+            try:
+                chunks = set(json.loads(lol_ftp.read_file(ftp, chunk_index_path).decode('utf-8')))
+            except lol_ftp.error_perm:
+                chunks = set()
+
         with tempfile.TemporaryDirectory() as temp_dir_path:   
-            for asset in [asset for asset in assets if 'new' in asset.keys()]:
-                if not ui_props.blendermarket_assets:
-                    temp_zip_path = join(temp_dir_path, asset['url'])
+            for row in store.rows(new=True):
+                url = store.urls[row]
+                if not ui_props.blendermarket_assets and ui_props.delta_upload:
+                    blendpath = join(bpy.path.abspath(ui_props.filepath), splitext(url)[0]+'.blend')
+                    ftp = self.uploadDelta(context, ftp, ftppath, url, blendpath, store.get(row)['hash'], chunks)
+                elif not ui_props.blendermarket_assets:
+                    temp_zip_path = join(temp_dir_path, url)
                  
                     ftp.cwd(ftppath)      
                     chdir(ui_props.filepath)
-                    with zipfile.ZipFile(temp_zip_path, mode='w') as zf:
-                        zf.write(splitext(asset['url'])[0]+'.blend', compress_type=zipfile.ZIP_DEFLATED)
+                    blendname = splitext(url)[0]+'.blend'
+                    with trace.span('zip', file=url, bytes=getsize(blendname)):
+                        compress.write_zip(blendname, temp_zip_path, blendname, compress.quick_method(blendname))
             
                     with open(temp_zip_path,'rb') as file:
-                        filename = asset['url']
-                        ftp.storbinary(f'STOR {filename}', file)
+                        ftp = self.storeResumable(context, ftp, ftppath + '/' + url, file)
                 
-                ftp.cwd(ftppath+'/preview')
-                with open(asset['thumbnail'].filepath,'rb') as file:
-                    filename = splitext(asset['url'])[0]+'.jpg'
-                    ftp.storbinary(f'STOR {filename}', file)      
-        
-        used_images = [splitext(a.url)[0]+'.jpg' for a in assets if not a.deleted]
-        
-        # Delete files which are not needed anymore
-        # TODO: Check if files are used from other assets
-        for asset in [asset for asset in assets if asset.deleted]:
-            if not ui_props.blendermarket_assets:
-                ftp.cwd(ftppath)
-                filename = asset['url']
-                ftp.delete(filename)
-
-            ftp.cwd(ftppath+'/preview')
-            with open(asset['thumbnail'].filepath,'rb') as file:
-                filename = splitext(asset['url'])[0]+'.jpg'
-                if not filename in used_images: 
-                    ftp.delete(filename)
+                if 'proxy_hash' in store.get(row):
+                    proxypath = ftppath + '/' + proxy.proxy_path(url)
+                    self.makeDirs(ftp, dirname(proxypath))
+                    with open(join(ui_props.repopath, ftppath[1:], proxy.proxy_path(url)), 'rb') as file:
+                        ftp = self.storeResumable(context, ftp, proxypath, file)
+
+                self.uploadPreviews(context, ftp, ftppath, url, store.thumbnails.get(row))
+
+        if ui_props.delta_upload:
+            # the index comes after the chunks, a chunk in the index is always on the server
+            bytestream = BytesIO(delta.dump_chunk_index(chunks).encode('utf-8'))
+            ftp = self.storeResumable(context, ftp, chunk_index_path, bytestream)
+
+        if thumbnails.available():
+            filename = toc_filename(ui_props.asset_type, ui_props.blendermarket_assets)
+            preview_dir = join(ui_props.repopath, ftppath[1:], 'preview')
+            index_path = join(preview_dir, thumbnails.atlas_dir(filename), thumbnails.ATLAS_INDEX)
+            if exists(index_path):
+                with open(index_path) as file_handle:
+                    index = json.loads(file_handle.read())
+                self.storeFiles(ftp, ftppath+'/preview', preview_dir, thumbnails.atlas_files(index, filename))
+
+        if ui_props.build_packs:
+            filename = toc_filename(ui_props.asset_type, ui_props.blendermarket_assets)
+            index = pack.load_index(ui_props.repopath, filename)
+            if index is not None:
+                with trace.span('upload packs', items=len(index['packs'])):
+                    ftp = self.uploadPacks(context, ftp, ftppath, filename, index)
+
+        # Delete files which are not referenced by any local or remote TOC anymore
+        with trace.span('collect references'):
+            toc_assets = [{'url': store.urls[row]} for row in store.rows()]
+            refs = collect.repository_references(ui_props.repopath, ftp,
+                                                 {toc_filename(ui_props.asset_type, ui_props.blendermarket_assets): toc_assets})
+            remote_files = collect.remote_files(ftp)
+
+        for row in store.rows(deleted=True):
+            orphans = [path for path in collect.asset_files(ftppath[1:], {'url': store.urls[row]}) if refs[path] == 0 and path in remote_files]
+            collect.delete_remote(ftp, orphans)
 
         ftp.quit()
     
@@ -594,24 +1178,18 @@ class LOLUploadTOCOperator(Operator):
     def execute(self, context):
         ui_props = context.scene.editAsset
     
-        assets = []
-        for asset in ui_props.assets:
-            if not asset.deleted:
-                new_asset = {}
-                new_asset['name'] = asset['name']
-                new_asset['url'] = asset['url']
-                new_asset['category'] = asset['category']
-                new_asset['hash'] =  asset['hash']
-                new_asset['date'] =  asset['date']
-     
-                if ui_props.asset_type == 'MODEL':
-                    new_asset['bbox_min'] = [asset['bbox_min'][0],asset['bbox_min'][1],asset['bbox_min'][2]]
-                    new_asset['bbox_max'] = [asset['bbox_max'][0],asset['bbox_max'][1],asset['bbox_max'][2]]
-            
-                assets.append(new_asset)    
+        assets = catalog_store.toc_entries()
+
+        # With Delta Upload the server only gets chunks and recipes, the zips do not exist there
+        # yet. The TOC is uploaded as <toc>.pending and clients keep the current one until
+        # 'python -m lol.delta assemble <server root>' is run on the server, which rebuilds the
+        # zips, checks them against the TOC hashes and then moves the pending TOC into place.
+        pending = ui_props.delta_upload and not ui_props.blendermarket_assets
           
-        self.uploadToC(context, assets)
-        self.uploadFiles(context, ui_props.assets)     
+        with trace.span('upload toc', items=len(assets)):
+            self.uploadToC(context, assets, pending)
+        with trace.span('upload files'):
+            self.uploadFiles(context, catalog_store)     
               
         return {'FINISHED'}
     
@@ -619,13 +1197,17 @@ class LOLUploadTOCOperator(Operator):
 class LOLUpdateGitRepositoy(Operator):
     bl_idname = 'scene.luxcore_ol_update_git_repository'
     bl_label = 'LuxCore Online Library Update GIT Repository'
-    bl_options = {'REGISTER', 'UNDO', 'INTERNAL'}
+    bl_options = {'REGISTER', 'INTERNAL'}
 
     @classmethod
     def description(cls, context, properties):
         return 'Update Git Repository with changed assets'
+
+    @classmethod
+    def poll(cls, context):
+        return catalog_complete()
     
-    def saveToC(self, context, assets):
+    def saveToC(self, context, store):
         ui_props = context.scene.editAsset
         
         if ui_props.blendermarket_assets:
@@ -635,28 +1217,19 @@ class LOLUpdateGitRepositoy(Operator):
         else: 
             filename = 'assets_model.json'
 
-        assets = []
-        for asset in ui_props.assets:
-            if not asset.deleted:
-                new_asset = {}
-                new_asset['name'] = asset['name']
-                new_asset['url'] = asset['url']
-                new_asset['category'] = asset['category']
-                new_asset['hash'] =  asset['hash']
-                new_asset['date'] =  asset['date']
-     
-                if ui_props.asset_type == 'MODEL':
-                    new_asset['bbox_min'] = [asset['bbox_min'][0],asset['bbox_min'][1],asset['bbox_min'][2]]
-                    new_asset['bbox_max'] = [asset['bbox_max'][0],asset['bbox_max'][1],asset['bbox_max'][2]]
-            
-                assets.append(new_asset)
+        assets = store.toc_entries()
         
         with open(join(ui_props.repopath, version, filename),'w') as file:   
             file.write(json.dumps(assets, indent=2))
+        catalog_cache.forget(join(bpy.path.abspath(ui_props.repopath), version, filename))
                 
     def execute(self, context):
+        with trace.span('update git repository'):
+            return self.update(context)
+
+    def update(self, context):
         ui_props = context.scene.editAsset 
-        assets = ui_props.assets
+        store = catalog_store
                     
         #Copy files    
         if ui_props.asset_type == 'MATERIAL':
@@ -664,77 +1237,105 @@ class LOLUpdateGitRepositoy(Operator):
         else: 
             typepath = 'model'
 
+        preview_dir = join(ui_props.repopath, typepath, 'preview')
+        preview_jobs = []
+        proxy_jobs = []
+
         with tempfile.TemporaryDirectory() as temp_dir_path:   
-            for asset in [asset for asset in assets if 'new' in asset.keys() and not 'deleted' in asset.keys()]:
+            for row in store.rows(new=True):
+                url = store.urls[row]
                 if not ui_props.blendermarket_assets:
-                    temp_zip_path = join(temp_dir_path, asset['url'])
+                    temp_zip_path = join(temp_dir_path, url)
                      
                     chdir(ui_props.filepath)
-                    # compress .blend file as zip
-                    with zipfile.ZipFile(temp_zip_path, mode='w') as zf:
-                        zf.write(splitext(asset['url'])[0]+'.blend', compress_type=zipfile.ZIP_DEFLATED)
+                    # compress .blend file as zip, already compressed blends are only stored
+                    blendname = splitext(url)[0]+'.blend'
+                    with trace.span('zip', file=url, bytes=getsize(blendname)):
+                        compress.write_zip(blendname, temp_zip_path, blendname, compress.quick_method(blendname))
             
+                    asset_cost = store.get(row).get('cost')
+                    if asset_cost is not None:
+                        store.set(row, 'cost', dict(asset_cost, zip_size=getsize(temp_zip_path)))
+
                     print('Copy file:', temp_zip_path)
-                    copyfile(temp_zip_path, join(ui_props.repopath, typepath, asset['url']))
+                    with trace.span('copy', file=url, bytes=getsize(temp_zip_path)):
+                        copyfile(temp_zip_path, join(ui_props.repopath, typepath, url))
                 
-                print('Copy Image:', asset['thumbnail'].filepath)                    
-                copyfile(asset['thumbnail'].filepath, join(ui_props.repopath, typepath, 'preview', splitext(asset['url'])[0]+'.jpg'))
+                    if typepath == 'model' and ui_props.build_proxies:
+                        proxy_jobs.append((row, join(bpy.path.abspath(ui_props.filepath), splitext(url)[0]+'.blend'),
+                                           join(ui_props.repopath, typepath, proxy.proxy_path(url))))
+
+                # the source preview is published as it is, the pipeline only adds the variants
+                thumbnail = store.thumbnails.get(row)
+                if thumbnail is None:
+                    ui_props.messages.append(store.names[row] + ': Asset has no preview image. Preview not published.')
+                    continue
+                print('Copy Image:', thumbnail)
+                copyfile(thumbnail, join(preview_dir, splitext(url)[0]+'.jpg'))
+                if thumbnails.available():
+                    preview_jobs.append((bpy.path.abspath(thumbnail), splitext(url)[0]))
+
+        # decimated proxies of heavy models in background Blender processes, their hash goes into the TOC
+        if proxy_jobs:
+            print('Create proxies:', len(proxy_jobs))
+            with trace.span('build proxies', items=len(proxy_jobs)):
+                results = proxy.build_proxies(bpy.app.binary_path, [job[1:] for job in proxy_jobs], ui_props.proxy_budget)
+            for (row, src, target), fields in zip(proxy_jobs, results):
+                store.set(row, 'proxy_hash', fields.get('proxy_hash'))
+                store.set(row, 'proxy_triangles', fields.get('proxy_triangles'))
+                if not fields and exists(target):
+                    remove(target)
+
+        toc_assets = store.toc_entries()
+
+        # resize and re-encode previews in worker processes, then repack the category atlases
+        if thumbnails.available():
+            print('Create previews:', len(preview_jobs))
+            with trace.span('build previews', items=len(preview_jobs)):
+                thumbnails.build_previews(preview_jobs, preview_dir, force=True)
+            with trace.span('build atlases', items=len(toc_assets)):
+                thumbnails.build_atlases(toc_assets, preview_dir, toc_filename(ui_props.asset_type, ui_props.blendermarket_assets))
+        else:
+            print('Pillow not found, previews are copied without variants')
 
+        # optional pack files with the zips and previews of every category, only changed packs are rewritten
+        if ui_props.build_packs:
+            with trace.span('build packs', items=len(toc_assets)):
+                index, written = pack.build_packs(ui_props.repopath, toc_filename(ui_props.asset_type, ui_props.blendermarket_assets), toc_assets)
+            print('Packs written:', len(written))
         
-        used_images = [splitext(a.url)[0]+'.jpg' for a in assets if not a.deleted]
-        
-        # Delete files which are not needed anymore
-        # TODO: Check if files are used from other assets
-        for asset in [asset for asset in assets if asset.deleted]:
-            if not ui_props.blendermarket_assets:
-                filename = join(ui_props.repopath, typepath, asset['url'])
-                if exists(filename):
-                    remove(filename) 
-
-            filename = join(ui_props.repopath, typepath, 'preview', splitext(asset['url'])[0]+'.jpg')
-            if exists(filename) and not splitext(asset['url'])[0]+'.jpg' in used_images:
-                remove(filename)
-        
-        self.saveToC(context, assets)
+        # Delete files which are not referenced by any TOC anymore, other TOCs may share zips and previews
+        with trace.span('collect references'):
+            refs = collect.repository_references(ui_props.repopath,
+                                                 override={toc_filename(ui_props.asset_type, ui_props.blendermarket_assets): toc_assets})
+        for row in store.rows(deleted=True):
+            for path in collect.asset_files(typepath, {'url': store.urls[row]}):
+                filename = join(ui_props.repopath, path)
+                if refs[path] == 0 and exists(filename):
+                    print('Delete file:', path)
+                    remove(filename)
         
-        import subprocess
-        chdir(ui_props.repopath)
+        with trace.span('save toc'):
+            self.saveToC(context, store)
         
-        if ui_props.blendermarket_assets:
-            filename = 'assets_model_blendermarket.json'
-        elif ui_props.asset_type == 'MATERIAL':
-            filename = 'assets_material.json'
-        else: 
-            filename = 'assets_model.json'
+        filename = toc_filename(ui_props.asset_type, ui_props.blendermarket_assets)
         
         #Add table of contents file    
-        process = subprocess.Popen("git add " + filename, stdout=subprocess.PIPE)
-        print(process.communicate()[0].decode('utf-8'))
-        process.wait()
+        print(repo.run(['git', 'add', filename], ui_props.repopath))
 
         #Add asset files to commit
-        process = subprocess.Popen("git add " + typepath, stdout=subprocess.PIPE)
-        print(process.communicate()[0].decode('utf-8'))
-        process.wait()
+        print(repo.run(['git', 'add', typepath], ui_props.repopath))
 
-        process = subprocess.Popen("git status", stdout=subprocess.PIPE)
-        print(process.communicate()[0].decode('utf-8'))
-        process.wait()
+        print(repo.run(['git', 'status'], ui_props.repopath))
          
         #Commit changes
-        process = subprocess.Popen('git commit -a -m "Update Assets"', stdout=subprocess.PIPE)
-        print(process.communicate()[0].decode('utf-8'))
-        process.wait()
+        print(repo.run(['git', 'commit', '-a', '-m', 'Update Assets'], ui_props.repopath))
         
         #Pull commits from server
-        process = subprocess.Popen("git pull", stdout=subprocess.PIPE)
-        print(process.communicate()[0].decode('utf-8'))
-        process.wait()
+        print(repo.run(['git', 'pull'], ui_props.repopath))
 
         #Push commits to server
-        process = subprocess.Popen("git push", stdout=subprocess.PIPE)
-        print(process.communicate()[0].decode('utf-8'))
-        process.wait()
+        print(repo.run(['git', 'push'], ui_props.repopath))
         
         # Update Server
         bpy.ops.scene.luxcore_ol_upload_toc()
@@ -742,6 +1343,40 @@ class LOLUpdateGitRepositoy(Operator):
         return {'FINISHED'}
 
 
+class LOLExportTraceOperator(Operator):
+    bl_idname = 'scene.luxcore_ol_export_trace'
+    bl_label = 'LuxCore Online Library Export Trace'
+    bl_options = {'REGISTER', 'INTERNAL'}
+
+    filepath: StringProperty(name='filepath', default='lol_trace.json', subtype='FILE_PATH', options={'SKIP_SAVE'})
+
+    @classmethod
+    def description(cls, context, properties):
+        return 'Export the recorded stage timings as Chrome trace (chrome://tracing, ui.perfetto.dev)'
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        trace.export_chrome_trace(bpy.path.abspath(self.filepath))
+        return {'FINISHED'}
+
+
+class LOLClearTraceOperator(Operator):
+    bl_idname = 'scene.luxcore_ol_clear_trace'
+    bl_label = 'LuxCore Online Library Clear Trace'
+    bl_options = {'REGISTER', 'INTERNAL'}
+
+    @classmethod
+    def description(cls, context, properties):
+        return 'Clear the recorded stage timings'
+
+    def execute(self, context):
+        trace.reset()
+        return {'FINISHED'}
+
+
 class BackgroundThread(threading.Thread):
     def __init__(self, context):
         self.context = context
@@ -755,34 +1390,19 @@ class BackgroundThread(threading.Thread):
         return self._stop_event.is_set()
 
     def run(self):
-        from time import sleep
         ui_props = self.context.scene.editAsset
+        repopath = bpy.path.abspath(ui_props.repopath)
         
         ui_props.progress_info = 'Cloning git repository...'
         print('Cloning git repository...')
         self.context.window_manager.windows.update()
-        if ui_props.repopath[-1] == '\\':
-            path = ui_props.repopath[:-1]
-        else:
-            path = ui_props.repopath
-        process = subprocess.Popen('git clone https://github.com/LuxCoreRender/LoL.git "' + path + '"', shell=True, stdout=subprocess.PIPE)
-        process.wait()
+        repo.clone(repopath)
         
         ui_props.progress_info = 'Fetching LFS objects...'
         print('Fetching LFS objects...')
-        
-        chdir(ui_props.repopath)
-        process = subprocess.Popen('git-lfs fetch', stdout=subprocess.PIPE)
-        process.wait()
-        
-        ui_props.progress_info = 'Checkout LFS objects...'
-        print('Checkout LFS objects...')
-        
-        process = subprocess.Popen('git-lfs checkout', stdout=subprocess.PIPE)
-        process.wait()
+        repo.fetch_lfs(repopath)
         
         ui_props.git_repo = True
-        chdir('..')
         print('finished')
 
 
@@ -790,7 +1410,7 @@ class BackgroundThread(threading.Thread):
 class LOLCloneGitRepositoy(Operator):
     bl_idname = 'scene.luxcore_ol_clone_git_repository'
     bl_label = 'LuxCore Online Library Clone GIT Repository'
-    bl_options = {'REGISTER', 'UNDO', 'INTERNAL'}
+    bl_options = {'REGISTER', 'INTERNAL'}
 
     @classmethod
     def description(cls, context, properties):
@@ -859,7 +1479,10 @@ class VIEW3D_PT_LUXCORE_ONLINE_LIBRARY_EDIT_ASSETS(Panel):
                 col.enabled = True
             
             op = col.operator('scene.luxcore_ol_update_git_repository', text='Update Git Repository')
-    
+            if not ui_props.progress_info == '':
+                col = layout.column(align=True)
+                col.label(text=ui_props.progress_info, icon=INFO)
+
             self.draw_login_info(context, layout)
 
             row = layout.row()
@@ -872,6 +1495,15 @@ class VIEW3D_PT_LUXCORE_ONLINE_LIBRARY_EDIT_ASSETS(Panel):
             col.prop(ui_props, 'blendermarket_assets', text='Blendermarket Assets')
             col = layout.column(align=True)
             col.prop(ui_props, 'advanced_settings', text='Advanced Settings')
+            if ui_props.advanced_settings:
+                col.prop(ui_props, 'build_packs', text='Build Pack Files')
+                col.prop(ui_props, 'delta_upload', text='Delta Upload')
+                col.prop(ui_props, 'build_proxies', text='Build Model Proxies')
+                if ui_props.build_proxies:
+                    col.prop(ui_props, 'proxy_budget', text='Proxy Triangles')
+                col.prop(ui_props, 'trace_enabled', text='Record Stage Timings')
+                if ui_props.trace_enabled:
+                    self.draw_trace_summary(context, layout)
             
             layout.separator()
             row = layout.row(align=True)
@@ -881,6 +1513,14 @@ class VIEW3D_PT_LUXCORE_ONLINE_LIBRARY_EDIT_ASSETS(Panel):
             col = row.column(align=True)
             col.prop(ui_props, "asset_sorttype", text="Sort by:", expand=False, icon_only=False)
 
+            row = layout.row(align=True)
+            col = row.column(align=True)
+            col.enabled = len(catalog_store.undo_stack) > 0
+            col.operator('scene.luxcore_ol_undo_catalog', text='Undo', icon='LOOP_BACK')
+            col = row.column(align=True)
+            col.enabled = len(catalog_store.redo_stack) > 0
+            col.operator('scene.luxcore_ol_redo_catalog', text='Redo', icon='LOOP_FORWARDS')
+
             
             col = layout.column(align=True)
             box = col.box()
@@ -893,21 +1533,17 @@ class VIEW3D_PT_LUXCORE_ONLINE_LIBRARY_EDIT_ASSETS(Panel):
                      icon_only=True, emboss=False)
             col = row.column()
             
-            col.label(text='{0} assets found'.format(len([asset for asset in ui_props.assets if not asset.deleted])))      
+            col.label(text='{0} assets found'.format(catalog_store.count()))      
 
             if ui_props.show_assets:
-                if ui_props.asset_sorttype == 'NAME':
-                    sorted_assets = sorted(ui_props.assets, key=lambda c: c.name.lower())
-                elif ui_props.asset_sorttype == 'CATEGORY':
-                    sorted_assets = sorted(ui_props.assets, key=lambda c: c.name.lower())
-                    sorted_assets = sorted(sorted_assets, key=lambda c: c.category.lower())
-                elif ui_props.asset_sorttype == 'NEW':
-                    sorted_assets = sorted(ui_props.assets, key=lambda c: c.name.lower())
-                    sorted_assets = sorted(sorted_assets, key=lambda c: c.new, reverse=True)
+                pages = ceil(catalog_store.count() / ASSETS_PER_PAGE)
+                if pages > 1:
+                    row = box.row()
+                    row.prop(ui_props, 'asset_page')
+                    row.label(text='of {0}'.format(pages))
                       
-                for idx, asset in enumerate(sorted_assets):
-                    if not asset.deleted:
-                        self.draw_assetlist(box, asset, idx, True)
+                for asset in ui_props.assets:
+                    self.draw_assetlist(box, asset, asset.row, True)
           
             layout.separator()
             col = layout.column(align=True)       
@@ -918,6 +1554,7 @@ class VIEW3D_PT_LUXCORE_ONLINE_LIBRARY_EDIT_ASSETS(Panel):
             
             op = col.operator('scene.luxcore_ol_check_path', text='Check path for assets')
             op.filepath = ui_props.filepath
+            col.prop(ui_props, 'watch_filepath', text='Watch path for new assets')
             
             col = layout.column(align=True)    
             
@@ -948,7 +1585,30 @@ class VIEW3D_PT_LUXCORE_ONLINE_LIBRARY_EDIT_ASSETS(Panel):
                         self.draw_assetlist(box, asset, idx)
 
 
+    def draw_trace_summary(self, context, layout):
+        stages = trace.summary()
+        if not len(stages):
+            return
+
+        box = layout.box()
+        row = box.row()
+        row.label(text='Stage')
+        row.label(text='Calls')
+        row.label(text='Total')
+        row.label(text='Counters')
+        for (name, calls, total, longest, counters) in stages[:TRACE_SUMMARY_ROWS]:
+            row = box.row()
+            row.label(text=name)
+            row.label(text=str(calls))
+            row.label(text='{0:.0f} ms'.format(total))
+            row.label(text=trace.format_counters(counters))
+
+        row = box.row(align=True)
+        row.operator('scene.luxcore_ol_export_trace', text='Export Trace')
+        row.operator('scene.luxcore_ol_clear_trace', text='Clear')
+
     def draw_assetlist(self, layout, asset, idx, add_remove=False):
+        ui_props = bpy.context.scene.editAsset
         col = layout.column(align=True)
         # Upper row (enable/disable, name, remove)
         box = col.box()
@@ -974,6 +1634,11 @@ class VIEW3D_PT_LUXCORE_ONLINE_LIBRARY_EDIT_ASSETS(Panel):
         if asset.show_settings:
             col = box.column(align=True)
             col.prop(asset, 'category')
+            if asset.row >= 0:
+                asset_cost = catalog_store.extras.get(asset.row, {}).get('cost')
+            else:
+                asset_cost = new_asset_costs.get(asset.hash)
+            col.label(text=cost.describe(asset_cost))
             if ui_props.advanced_settings:
                 col = box.column(align=True)
                 col.prop(asset, 'url', text='URL')
@@ -1009,6 +1674,8 @@ class LuxCoreOnlineLibraryEditAsset(PropertyGroup):
     password : StringProperty(name='Password', description='Password for FTP Server Login', default='', subtype='PASSWORD',  options={'SKIP_SAVE'})
     repopath : StringProperty(name='Repository', description='Git Repository Directory', subtype='DIR_PATH', update=update_repopath)
     filepath : StringProperty(name='Filepath', description='Directory with new assets', subtype='DIR_PATH', update=update_filepath)
+    watch_filepath : BoolProperty(name='Watch Filepath', description='Add new and modified assets as soon as they are copied to the directory',
+                                  default=False, options={'SKIP_SAVE'}, update=update_watch_filepath)
     git_repo : BoolProperty(default=False)
     gitclone : BoolProperty(default=False)
     show_assets : BoolProperty(default=False)
@@ -1032,6 +1699,9 @@ class LuxCoreOnlineLibraryEditAsset(PropertyGroup):
         ('CATEGORY', 'Category', 'Category', '', 1),
         ('NEW', 'New', 'New', '', 2),
         #('DATE', 'Date', 'Date', '', 3),
+        ('TRIANGLES', 'Triangles', 'Triangles, most first', '', 4),
+        ('TEXTURE_MEMORY', 'Texture Memory', 'Decoded texture size, largest first', '', 5),
+        ('DOWNLOAD_SIZE', 'Download Size', 'Zip size, largest first', '', 6),
     ]
     
     asset_sorttype: EnumProperty(name='Asset Sort Type', items=asset_sortitems, description='Sort assets by ...',
@@ -1039,13 +1709,54 @@ class LuxCoreOnlineLibraryEditAsset(PropertyGroup):
     
     
     assets: CollectionProperty(type=LuxCoreOnlineLibraryAsset)
+    asset_page: IntProperty(name='Page', description='Page of the asset list', default=1, min=1, update=update_asset_page)
     blendermarket_assets: BoolProperty(default=False, update=switch_blendermarket)
     new_assets: CollectionProperty(type=LuxCoreOnlineLibraryAsset)
     remove_assets: CollectionProperty(type=LuxCoreOnlineLibraryAsset)
     advanced_settings: BoolProperty(default=False)
+    delta_upload: BoolProperty(name='Delta Upload', description='Upload only new chunks of changed blends and a recipe instead of the zip, '
+                               'the TOC is published when the server rebuilt the zips with lol.delta assemble', default=False)
+    build_packs: BoolProperty(name='Build Pack Files', description='Also publish the zips and previews of every category as pack files with an index',
+                              default=False)
+    build_proxies: BoolProperty(name='Build Model Proxies', description='Publish a decimated proxy next to every new model '
+                                'with more triangles than the proxy budget', default=False)
+    proxy_budget: IntProperty(name='Proxy Triangles', description='Triangle budget of the model proxies',
+                              default=proxy.TRIANGLE_BUDGET, min=100)
+    trace_enabled: BoolProperty(name='Record Stage Timings', description='Record the time spent in every stage of the operators',
+                                default=False, options={'SKIP_SAVE'}, update=update_trace_enabled)
+
+
+def startup():
+    # Reset the session state and start the repository update in the background.
+    # Runs from a timer because the scene is not accessible while registering.
+    ui_props = bpy.context.scene.editAsset
+
+    ui_props.username = ''
+    ui_props.password = ''
+    ui_props.progress_info = ''
+    ui_props.git_repo = False
+    ui_props.gitclone = False
+    ui_props.watch_filepath = False
+    ui_props.trace_enabled = False
+
+    ui_props.assets.clear()
+    ui_props.new_assets.clear()
+    ui_props.remove_assets.clear()
+    catalog_store.clear()
+    catalog_cache.clear()
+
+    if repo.is_repository(bpy.path.abspath(ui_props.repopath)):
+        ui_props.git_repo = True
+        start_repo_sync(bpy.context)
+    return None
 
 
 def register():
+    bpy.utils.register_class(LuxCoreOnlineLibraryAsset)
+    bpy.utils.register_class(LuxCoreOnlineLibraryEditAsset)
+    bpy.utils.register_class(LOLLoadTOCfromGitRepositoy)
+    bpy.types.Scene.editAsset = PointerProperty(type=LuxCoreOnlineLibraryEditAsset)    
+
     bpy.utils.register_class(VIEW3D_PT_LUXCORE_ONLINE_LIBRARY_EDIT_ASSETS)
     bpy.utils.register_class(LOLUploadTOCOperator)
     bpy.utils.register_class(LOLAddAssetOperator)
@@ -1053,11 +1764,20 @@ def register():
     bpy.utils.register_class(LOLCheckPathOperator)
     bpy.utils.register_class(LOLRemoveAssetOperator)
     bpy.utils.register_class(LOLClearMessagesOperator)
+    bpy.utils.register_class(LOLUndoCatalogOperator)
+    bpy.utils.register_class(LOLRedoCatalogOperator)
     bpy.utils.register_class(LOLUpdateGitRepositoy)
     bpy.utils.register_class(LOLCloneGitRepositoy)
+    bpy.utils.register_class(LOLExportTraceOperator)
+    bpy.utils.register_class(LOLClearTraceOperator)
+
+    bpy.app.timers.register(startup, first_interval=0.0)
 
 
 def unregister():
+    for timer in (watch_filepath_timer, repo_sync_timer, toc_load_timer, startup):
+        if bpy.app.timers.is_registered(timer):
+            bpy.app.timers.unregister(timer)
     bpy.utils.unregister_class(VIEW3D_PT_LUXCORE_ONLINE_LIBRARY_EDIT_ASSETS)
     bpy.utils.unregister_class(LuxCoreOnlineLibraryEditAsset)
     bpy.utils.unregister_class(LOLUploadTOCOperator)
@@ -1067,52 +1787,15 @@ def unregister():
     bpy.utils.unregister_class(LOLCheckPathOperator)
     bpy.utils.unregister_class(LOLRemoveAssetOperator)
     bpy.utils.unregister_class(LOLClearMessagesOperator)
+    bpy.utils.unregister_class(LOLUndoCatalogOperator)
+    bpy.utils.unregister_class(LOLRedoCatalogOperator)
     bpy.utils.unregister_class(LOLUpdateGitRepositoy)
     bpy.utils.unregister_class(LOLLoadTOCfromGitRepositoy)
     bpy.utils.unregister_class(LOLCloneGitRepositoy)
+    bpy.utils.unregister_class(LOLExportTraceOperator)
+    bpy.utils.unregister_class(LOLClearTraceOperator)
    
 ######################################################################################################################
 
-# Register Properties
-bpy.utils.register_class(LuxCoreOnlineLibraryAsset)
-bpy.utils.register_class(LuxCoreOnlineLibraryEditAsset)
-bpy.utils.register_class(LOLLoadTOCfromGitRepositoy)
-bpy.types.Scene.editAsset = PointerProperty(type=LuxCoreOnlineLibraryEditAsset)    
-
-ui_props = bpy.context.scene.editAsset
-user_preferences = bpy.context.preferences.addons['BlendLuxCore'].preferences
-
-ui_props.username = ''
-ui_props.password = ''
-ui_props.progress_info = ''
-ui_props.git_repo = False
-ui_props.gitclone = False
-
-edit_assets_prop = bpy.context.scene.editAsset.assets
-edit_assets_prop.clear()
-        
-new_assets_prop = bpy.context.scene.editAsset.new_assets
-new_assets_prop.clear()
-
-remove_assets_prop = bpy.context.scene.editAsset.remove_assets
-remove_assets_prop.clear()
-
-register()
-
-if exists(join(ui_props.repopath,'.git')):
-    ui_props.git_repo = True
-    ui_props.progress_info = 'Updating repository'
-    
-    chdir(ui_props.repopath)
-    process = subprocess.Popen('git pull', stdout=subprocess.PIPE)
-    process.wait()
-
-    process = subprocess.Popen('git-lfs fetch', stdout=subprocess.PIPE)
-    process.wait()
-    
-    process = subprocess.Popen('git-lfs checkout', stdout=subprocess.PIPE)
-    process.wait()
-    ui_props.progress_info = ''
-    chdir('..')
-    
-    bpy.ops.scene.luxcore_ol_load_toc_from_git_repository()
+if __name__ == '__main__':
+    register()
@@ -0,0 +1,119 @@
+# Creates the decimated proxy of a model blend. Runs in a background Blender
+# started by lol.proxy, one process per model:
+#
+#   blender -b --factory-startup --python ProxyWorker.py -- <model.blend> <proxy.blend> <triangles>
+#
+# Every mesh gets a Decimate modifier with the ratio which brings the model to
+# the triangle budget. The vertices at the minimum and maximum of each axis are
+# protected with a vertex group, so the bounding box of the proxy is the one
+# of the model. The result is printed as one JSON line starting with RESULT.
+# No proxy is written if the model is already within the budget.
+
+import bpy
+import json
+import sys
+
+from mathutils import Vector
+
+RESULT = 'LOL_PROXY_RESULT '
+EXTREMES_GROUP = 'LOL_proxy_extremes'
+
+
+def calc_bbox(objects):
+    # same as the asset management tool, corners of the object bounding boxes in world space
+    bbox_min = [10000, 10000, 10000]
+    bbox_max = [-10000, -10000, -10000]
+
+    deps = bpy.context.evaluated_depsgraph_get()
+    for obj in objects:
+        obj = obj.evaluated_get(deps)
+        for corner in [obj.matrix_world @ Vector(corner) for corner in obj.bound_box]:
+            for axis in range(3):
+                bbox_min[axis] = min(bbox_min[axis], corner[axis])
+                bbox_max[axis] = max(bbox_max[axis], corner[axis])
+    return bbox_min, bbox_max
+
+
+def triangles(objects):
+    deps = bpy.context.evaluated_depsgraph_get()
+    count = 0
+    for obj in objects:
+        if obj.type != 'MESH':
+            continue
+        mesh = obj.evaluated_get(deps).to_mesh()
+        mesh.calc_loop_triangles()
+        count += len(mesh.loop_triangles)
+        obj.evaluated_get(deps).to_mesh_clear()
+    return count
+
+
+def protect_extremes(obj):
+    # vertex group with the vertices at the bounding box of the mesh
+    mesh = obj.data
+    if not len(mesh.vertices):
+        return None
+
+    indices = set()
+    for axis in range(3):
+        values = [v.co[axis] for v in mesh.vertices]
+        indices.add(values.index(min(values)))
+        indices.add(values.index(max(values)))
+
+    group = obj.vertex_groups.new(name=EXTREMES_GROUP)
+    group.add(list(indices), 1.0, 'REPLACE')
+    return group
+
+
+def decimate(objects, ratio):
+    # meshes shared by several objects are decimated once
+    deps = bpy.context.evaluated_depsgraph_get()
+    decimated = {}
+    for obj in objects:
+        if obj.type != 'MESH':
+            continue
+
+        if obj.data.name not in decimated:
+            group = protect_extremes(obj)
+            modifier = obj.modifiers.new('LOL_proxy', 'DECIMATE')
+            modifier.decimate_type = 'COLLAPSE'
+            modifier.ratio = ratio
+            if group is not None:
+                modifier.vertex_group = group.name
+                modifier.vertex_group_factor = 1000.0
+            deps.update()
+
+            mesh = bpy.data.meshes.new_from_object(obj.evaluated_get(deps))
+            mesh.name = obj.data.name + '_proxy'
+            decimated[obj.data.name] = mesh
+
+        old_name = obj.data.name
+        obj.modifiers.clear()
+        obj.data = decimated[old_name]
+        if EXTREMES_GROUP in obj.vertex_groups:
+            obj.vertex_groups.remove(obj.vertex_groups[EXTREMES_GROUP])
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:]
+    source, target, budget = argv[0], argv[1], int(argv[2])
+
+    with bpy.data.libraries.load(source, link=False) as (data_from, data_to):
+        data_to.objects = [name for name in data_from.objects]
+
+    objects = [obj for obj in data_to.objects if obj is not None]
+    for obj in objects:
+        bpy.context.scene.collection.objects.link(obj)
+
+    bbox_min, bbox_max = calc_bbox(objects)
+    result = {'triangles': triangles(objects), 'bbox_min': bbox_min, 'bbox_max': bbox_max}
+
+    if result['triangles'] > budget:
+        decimate(objects, budget / result['triangles'])
+        result['proxy_triangles'] = triangles(objects)
+        result['proxy_bbox_min'], result['proxy_bbox_max'] = calc_bbox(objects)
+        bpy.data.libraries.write(target, set(objects), fake_user=True, compress=True)
+
+    print(RESULT + json.dumps(result))
+
+
+main()
@@ -0,0 +1 @@
+# makes the lol package importable for the tests, also when pytest runs from the repository root
@@ -0,0 +1,3 @@
+# Helper modules for the LuxCore Online Library asset management tool.
+# Nothing in here imports bpy, so the modules can also be run from a plain
+# Python interpreter, e.g. "python -m lol.thumbnails <repopath>".
@@ -0,0 +1,172 @@
+# Integrity audit of the repository against its TOC files.
+#
+# For every TOC entry the zip named by 'url' must exist, must not be an LFS
+# pointer which was never checked out, and the blend inside must match the
+# recorded sha256 'hash'. The blend is streamed out of the zip through the hash,
+# nothing is extracted to disk. Previews must exist as well. Verified digests are
+# cached by (path, size, mtime), so only new or changed zips are read again.
+#
+#   python -m lol.audit <repopath> [--legacy] [--jobs N] [--no-cache]
+
+import argparse
+import json
+import sys
+import zipfile
+
+from concurrent.futures import ThreadPoolExecutor
+from os import stat, replace
+from os.path import join, isfile, splitext, basename
+
+from .files import hash_stream, lfs_pointer_size
+from .toc import version, toc_paths, external_tocs, load_toc, preview_name
+
+CACHE_FILE = '.lol_audit_cache.json'
+
+MISSING_FILE = 'missing file'
+MISSING_PREVIEW = 'missing preview'
+LFS_POINTER = 'LFS pointer not checked out'
+HASH_MISMATCH = 'hash mismatch'
+BAD_ZIP = 'no blend in zip'
+
+
+def blend_member(zf, url):
+    # the blend is stored with the name of the zip, older archives may differ
+    names = [name for name in zf.namelist() if splitext(name)[1] == '.blend']
+    for name in names:
+        if basename(name) == splitext(url)[0] + '.blend':
+            return name
+    return names[0] if names else None
+
+
+def zip_digest(path, url):
+    with zipfile.ZipFile(path) as zf:
+        name = blend_member(zf, url)
+        if name is None:
+            return None
+        with zf.open(name) as file:
+            return hash_stream(file)
+
+
+def check_zip(path, url, cached):
+    # returns (issue or None, cache entry or None)
+    try:
+        st = stat(path)
+    except FileNotFoundError:
+        return MISSING_FILE, None
+
+    key = [st.st_size, st.st_mtime_ns]
+    if cached is not None and cached[:2] == key:
+        return None, cached
+
+    if lfs_pointer_size(path) is not None:
+        return LFS_POINTER, None
+
+    try:
+        digest = zip_digest(path, url)
+    except zipfile.BadZipFile:
+        digest = None
+    if digest is None:
+        return BAD_ZIP, None
+
+    return None, key + [digest]
+
+
+def check_preview(path):
+    if not isfile(path):
+        return MISSING_PREVIEW
+    if lfs_pointer_size(path) is not None:
+        return LFS_POINTER
+    return None
+
+
+def load_cache(repopath):
+    filepath = join(repopath, CACHE_FILE)
+    if not isfile(filepath):
+        return {}
+    with open(filepath) as file_handle:
+        return json.loads(file_handle.read())
+
+
+def save_cache(repopath, cache):
+    filepath = join(repopath, CACHE_FILE)
+    with open(filepath + '.tmp', 'w') as file:
+        file.write(json.dumps(cache))
+    replace(filepath + '.tmp', filepath)
+
+
+def audit(repopath, legacy=False, workers=None, cache=None):
+    # returns a list of (toc path, asset name, file, issue)
+    if cache is None:
+        cache = {}
+
+    tocs = [(path, typedir) for (path, typedir) in toc_paths() if legacy or path.startswith(version + '/')]
+
+    checks = []
+    for tocpath, typedir in tocs:
+        if not isfile(join(repopath, tocpath)):
+            continue
+        for asset in load_toc(join(repopath, tocpath)):
+            checks.append((tocpath, typedir, asset))
+
+    # several TOCs can share a zip, every zip is read only once
+    zips = {}
+    for tocpath, typedir, asset in checks:
+        if basename(tocpath) not in external_tocs:
+            zips.setdefault(typedir + '/' + asset['url'], asset['url'])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {path: executor.submit(check_zip, join(repopath, path), url, cache.get(path))
+                   for path, url in zips.items()}
+        results = {path: future.result() for path, future in futures.items()}
+
+    for path in list(cache):
+        if path not in results:
+            del cache[path]
+
+    issues = []
+    for tocpath, typedir, asset in checks:
+        path = typedir + '/' + asset['url']
+        if path in results:
+            issue, entry = results[path]
+            if issue is None:
+                # the digest stays cached on a mismatch, it describes the zip not the TOC
+                cache[path] = entry
+                if entry[2] != asset['hash']:
+                    issue = HASH_MISMATCH
+            if issue is not None:
+                issues.append((tocpath, asset['name'], path, issue))
+
+        preview = typedir + '/preview/' + preview_name(asset['url'])
+        issue = check_preview(join(repopath, preview))
+        if issue is not None:
+            issues.append((tocpath, asset['name'], preview, issue))
+
+    return issues
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the LoL repository against its TOC files')
+    parser.add_argument('repopath', help='LoL repository directory')
+    parser.add_argument('--legacy', action='store_true', help='also check the TOC files of older releases')
+    parser.add_argument('--jobs', type=int, default=None, help='number of worker threads')
+    parser.add_argument('--no-cache', action='store_true', help='verify every zip again')
+    args = parser.parse_args(argv)
+
+    cache = {} if args.no_cache else load_cache(args.repopath)
+    issues = audit(args.repopath, args.legacy, args.jobs, cache)
+    save_cache(args.repopath, cache)
+
+    summary = {}
+    for tocpath, name, path, issue in issues:
+        print('{0}: {1}: {2} ({3})'.format(tocpath, issue, path, name))
+        summary[issue] = summary.get(issue, 0) + 1
+
+    for issue, count in sorted(summary.items()):
+        print('{0}: {1}'.format(issue, count))
+    print('{0} issues found'.format(len(issues)))
+
+    return 1 if issues else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
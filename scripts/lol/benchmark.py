@@ -0,0 +1,211 @@
+# Benchmarks for the hot paths of the asset management tool.
+#
+# Synthetic catalogs shaped like the real TOCs (models with bbox, materials with
+# date) are generated at several sizes, together with a synthetic blend file.
+# The catalog is measured on lol.store.CatalogStore like the tool uses it and
+# the zip stage goes through lol.compress like publishing. This runs in a plain
+# Python interpreter. Results are written as JSON and can be compared
+# against a stored baseline:
+#
+#   python -m lol.benchmark --output baseline.json
+#   python -m lol.benchmark --baseline baseline.json [--threshold 0.2]
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+
+from datetime import date, timedelta
+from os.path import join
+from statistics import median
+from time import perf_counter
+from types import SimpleNamespace
+
+from . import catalog, compress
+from .store import CatalogStore, NEW
+from .files import hash_file
+
+SIZES = (1000, 10000, 100000)
+FILE_SIZE = 16 * 1024 ** 2
+REPEAT = 5
+
+CATEGORIES = ('Decoration', 'Furniture', 'Kitchen', 'Lighting', 'Plants', 'Bathroom', 'Building',
+              'Electronics', 'Misc', 'wood', 'metal', 'glass_transparent', 'stone', 'fabric', 'ground')
+WORDS = ('Oak', 'Table', 'Chair', 'Lamp', 'Metal', 'Brushed', 'Glass', 'Panel', 'Vase', 'Sofa',
+         'Brick', 'Wall', 'Concrete', 'Tile', 'Floor', 'Green', 'Dark', 'Modern', 'Classic', 'Set')
+
+
+def synthetic_toc(count, asset_type, seed=0):
+    rng = random.Random(seed)
+    start = date(2021, 1, 1)
+
+    assets = []
+    for idx in range(count):
+        name = ' '.join(rng.choice(WORDS) for i in range(rng.randint(1, 3))) + ' ' + str(idx)
+        asset = {
+            'name': name,
+            'url': name.replace(' ', '_') + '.zip',
+            'category': rng.choice(CATEGORIES),
+            'hash': '%064x' % rng.getrandbits(256),
+            'date': str(start + timedelta(days=rng.randint(0, 1000))),
+        }
+        if asset_type == 'MODEL':
+            bbox_min = [-rng.random() for i in range(3)]
+            asset['bbox_min'] = bbox_min
+            asset['bbox_max'] = [v + rng.random() * 2 for v in bbox_min]
+        assets.append(asset)
+    return assets
+
+
+def synthetic_blend(path, size, seed=0):
+    # half incompressible, half repetitive, roughly what a blend with packed textures looks like
+    rng = random.Random(seed)
+    block = 1024 ** 2
+    with open(path, 'wb') as file:
+        written = 0
+        while written < size:
+            if rng.random() < 0.5:
+                data = rng.randbytes(block)
+            else:
+                data = (b'MESH' + rng.randbytes(60)) * (block // 64)
+            file.write(data[:size - written])
+            written += len(data[:size - written])
+
+
+def timeit(function, repeat=REPEAT):
+    times = []
+    for i in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return {'min': min(times), 'median': median(times)}
+
+
+def bench_catalog(count, asset_type, repeat):
+    results = {}
+    toc = synthetic_toc(count, asset_type)
+    text = json.dumps(toc, indent=2)
+
+    def store_load():
+        return CatalogStore.from_toc(json.loads(text), asset_type)
+    results['store_load'] = timeit(store_load, repeat)
+
+    store = store_load()
+    store.flags[:len(store):10] |= NEW
+
+    def store_sort_draw():
+        for sorttype in ('NAME', 'CATEGORY', 'NEW'):
+            store._sort_keys = None
+            store.sorted_rows(sorttype)
+            store.count()
+    results['store_sort_draw'] = timeit(store_sort_draw, repeat)
+
+    # the drop folder assets, every tenth collides with the database by name, every twentieth by hash
+    new_assets = [SimpleNamespace(**entry) for entry in synthetic_toc(count // 10, asset_type, seed=1)]
+    for idx, asset in enumerate(new_assets):
+        if idx % 10 == 0:
+            asset.name = store.get(idx)['name']
+        if idx % 20 == 0:
+            asset.hash = store.get(idx)['hash']
+
+    def store_add_all():
+        names, hashes = store.keys()
+        return [catalog.duplicate(asset, names, hashes) for asset in new_assets]
+    results['store_add_all_duplicates'] = timeit(store_add_all, repeat)
+
+    def store_toc_serialize():
+        return json.dumps(store.toc_entries(), indent=2)
+    results['store_toc_serialize'] = timeit(store_toc_serialize, repeat)
+
+    return results
+
+
+def bench_files(file_size, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir_path:
+        blendpath = join(temp_dir_path, 'Synthetic.blend')
+        synthetic_blend(blendpath, file_size)
+
+        results['calc_hash'] = timeit(lambda: hash_file(blendpath), repeat)
+
+        def make_zip():
+            # method picked like a published asset
+            compress.write_zip(blendpath, join(temp_dir_path, 'Synthetic.zip'), 'Synthetic.blend', compress.quick_method(blendpath))
+        results['zip'] = timeit(make_zip, repeat)
+
+    for result in results.values():
+        result['mb_per_s'] = file_size / 1024 ** 2 / result['min']
+    return results
+
+
+def run(sizes=SIZES, file_size=FILE_SIZE, repeat=REPEAT):
+    results = {}
+    for count in sizes:
+        for asset_type in ('MODEL', 'MATERIAL'):
+            for name, result in bench_catalog(count, asset_type, repeat).items():
+                results['{0}[{1}/{2}]'.format(name, asset_type.lower(), count)] = result
+            print('catalog {0} {1} done'.format(asset_type.lower(), count))
+
+    for name, result in bench_files(file_size, repeat).items():
+        results['{0}[{1}MB]'.format(name, file_size // 1024 ** 2)] = result
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': str(date.today()),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    # returns the benchmarks which got slower than baseline * (1 + threshold)
+    regressions = []
+    for name, result in sorted(current['results'].items()):
+        if name not in baseline['results']:
+            print('{0:45} {1:10.4f}s  (new)'.format(name, result['min']))
+            continue
+
+        ratio = result['min'] / baseline['results'][name]['min']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'REGRESSION'
+            regressions.append(name)
+        print('{0:45} {1:10.4f}s  {2:6.2f}x  {3}'.format(name, result['min'], ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the LoL asset management hot paths')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='catalog sizes')
+    parser.add_argument('--file-size', type=int, default=FILE_SIZE // 1024 ** 2, help='synthetic blend size in MB')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown against the baseline')
+    args = parser.parse_args(argv)
+
+    current = run(args.sizes, args.file_size * 1024 ** 2, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(json.dumps(current, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as file_handle:
+            baseline = json.loads(file_handle.read())
+        regressions = compare(current, baseline, args.threshold)
+        print('{0} regressions'.format(len(regressions)))
+        return 1 if regressions else 0
+
+    for name, result in sorted(current['results'].items()):
+        print('{0:45} {1:10.4f}s'.format(name, result['min']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
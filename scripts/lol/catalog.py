@@ -0,0 +1,27 @@
+# Catalog logic of the asset management tool which does not need Blender.
+#
+# The functions work on anything with the attributes of a catalog entry, like
+# the LuxCoreOnlineLibraryAsset PropertyGroups in Blender.
+
+
+def toc_entry(asset, asset_type):
+    new_asset = {}
+    new_asset['name'] = asset.name
+    new_asset['url'] = asset.url
+    new_asset['category'] = asset.category
+    new_asset['hash'] = asset.hash
+    new_asset['date'] = asset.date
+
+    if asset_type == 'MODEL':
+        new_asset['bbox_min'] = [asset.bbox_min[0], asset.bbox_min[1], asset.bbox_min[2]]
+        new_asset['bbox_max'] = [asset.bbox_max[0], asset.bbox_max[1], asset.bbox_max[2]]
+    return new_asset
+
+
+def duplicate(asset, names, hashes, check_hash=True):
+    # 'hash' or 'name' if asset is already in the database, otherwise None
+    if check_hash and asset.hash in hashes:
+        return 'hash'
+    elif asset.name in names:
+        return 'name'
+    return None
@@ -0,0 +1,203 @@
+# Reference counted garbage collection of asset files.
+#
+# Every file below model/ and material/ (zips, previews, preview variants,
+# atlases, packs and model proxies) gets a reference count over all TOC files, current and legacy ones,
+# in the local repository and, if a server login is given, on the FTP mirror. Only
+# files nobody references are removed. Without --delete only the report is
+# printed (mark and sweep dry run). Recipes of delta uploads belong to their
+# asset, the content addressed chunk store is shared and not collected.
+#
+#   python -m lol.collect <repopath> [--username U --password P] [--delete]
+
+import argparse
+import json
+import subprocess
+import sys
+
+from collections import Counter
+from os import walk, remove
+from os.path import join, isfile, getsize, relpath, splitext
+
+from . import delta, pack, proxy, thumbnails
+from .files import lfs_pointer_size
+from .toc import version, toc_files, toc_paths, load_toc
+from . import ftp as lol_ftp
+
+KEEP = ('.gitattributes',)
+
+
+def asset_files(typedir, asset):
+    # repository paths (always with '/') an asset entry refers to
+    stem = splitext(asset['url'])[0]
+    files = [typedir + '/' + asset['url']]
+    for filename in thumbnails.preview_files(stem):
+        files.append(typedir + '/preview/' + filename.replace('\\', '/'))
+    files.append(typedir + '/' + delta.recipe_path(asset['url']))
+    files.append(typedir + '/' + proxy.proxy_path(asset['url']))
+    return files
+
+
+def local_tocs(repopath):
+    # {toc path: (asset directory, assets)}
+    tocs = {}
+    for path, typedir in toc_paths():
+        if isfile(join(repopath, path)):
+            tocs[path] = (typedir, load_toc(join(repopath, path)))
+    return tocs
+
+
+def remote_tocs(ftp):
+    tocs = {}
+    for path, typedir in toc_paths():
+        try:
+            data = lol_ftp.read_file(ftp, '/' + path)
+        except lol_ftp.error_perm:
+            continue
+        tocs[path] = (typedir, json.loads(data.decode('utf-8')))
+    return tocs
+
+
+def references(tocs, atlas_indexes=None, pack_indexes=None):
+    # atlas_indexes, pack_indexes: {toc filename: index} for the TOCs of the current version
+    refs = Counter()
+    for path, (typedir, assets) in tocs.items():
+        for asset in assets:
+            refs.update(asset_files(typedir, asset))
+
+    for filename, index in (atlas_indexes or {}).items():
+        for atlas_file in thumbnails.atlas_files(index, filename):
+            refs[toc_files[filename] + '/preview/' + atlas_file.replace('\\', '/')] += 1
+
+    for filename, index in (pack_indexes or {}).items():
+        for pack_file in pack.pack_files(index, filename):
+            refs[toc_files[filename] + '/' + pack_file.replace('\\', '/')] += 1
+    return refs
+
+
+def local_atlas_indexes(repopath):
+    indexes = {}
+    for filename, typedir in toc_files.items():
+        index_path = join(repopath, typedir, 'preview', thumbnails.atlas_dir(filename), thumbnails.ATLAS_INDEX)
+        if isfile(index_path):
+            with open(index_path) as file_handle:
+                indexes[filename] = json.loads(file_handle.read())
+    return indexes
+
+
+def local_pack_indexes(repopath):
+    indexes = {}
+    for filename in toc_files:
+        index = pack.load_index(repopath, filename)
+        if index is not None:
+            indexes[filename] = index
+    return indexes
+
+
+def repository_references(repopath, ftp=None, override=None):
+    # override: {toc filename: assets} for a TOC of the current version edited in this session
+    override = {version + '/' + filename: (toc_files[filename], assets) for filename, assets in (override or {}).items()}
+
+    tocs = local_tocs(repopath)
+    tocs.update(override)
+    refs = references(tocs, local_atlas_indexes(repopath), local_pack_indexes(repopath))
+
+    if ftp is not None:
+        tocs = remote_tocs(ftp)
+        tocs.update(override)
+        refs.update(references(tocs))
+    return refs
+
+
+def local_files(repopath):
+    files = {}
+    for typedir in sorted(set(toc_files.values())):
+        for root, dirs, filenames in walk(join(repopath, typedir)):
+            if root == join(repopath, typedir) and delta.CHUNK_DIR in dirs:
+                dirs.remove(delta.CHUNK_DIR)
+            for filename in filenames:
+                if filename in KEEP:
+                    continue
+                path = join(root, filename)
+                # count the real object size for LFS pointers which are not checked out
+                size = lfs_pointer_size(path)
+                files[relpath(path, repopath).replace('\\', '/')] = getsize(path) if size is None else size
+    return files
+
+
+def remote_files(ftp):
+    files = {}
+    for typedir in sorted(set(toc_files.values())):
+        for path, size in lol_ftp.list_files(ftp, '/' + typedir).items():
+            if path.split('/')[-1] not in KEEP and not path.startswith(delta.CHUNK_DIR + '/'):
+                files[typedir + '/' + path] = size
+    return files
+
+
+def sweep(files, refs):
+    # mark is done by references(), sweep returns the unreferenced files
+    return sorted(path for path in files if refs[path] == 0)
+
+
+def report(title, files, orphans):
+    size = sum(files[path] for path in orphans)
+    print('{0}: {1} of {2} files unreferenced, {3:.1f} MB'.format(title, len(orphans), len(files), size / 1024 ** 2))
+    for path in orphans:
+        print('  {0} ({1} bytes)'.format(path, files[path]))
+    return size
+
+
+def delete_local(repopath, orphans):
+    tracked = subprocess.run(['git', 'ls-files'], cwd=repopath, stdout=subprocess.PIPE).stdout.decode('utf-8').splitlines()
+    tracked = set(tracked)
+
+    untracked = [path for path in orphans if path not in tracked]
+    tracked = [path for path in orphans if path in tracked]
+
+    # batches keep the command line short enough for Windows
+    for idx in range(0, len(tracked), 100):
+        subprocess.run(['git', 'rm', '-q', '--'] + tracked[idx:idx + 100], cwd=repopath)
+    for path in untracked:
+        remove(join(repopath, path))
+
+    # drop the local LFS objects which are no longer referenced by any commit
+    subprocess.run(['git-lfs', 'prune'], cwd=repopath)
+
+
+def delete_remote(ftp, orphans):
+    for path in orphans:
+        ftp.delete('/' + path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find and remove LoL asset files not referenced by any TOC')
+    parser.add_argument('repopath', help='LoL repository directory')
+    parser.add_argument('--username', default='', help='FTP server login, also collect the mirror')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--delete', action='store_true', help='delete unreferenced files, default is a dry run')
+    args = parser.parse_args(argv)
+
+    ftp = None
+    if args.username:
+        ftp = lol_ftp.connect(args.username, args.password)
+
+    refs = repository_references(args.repopath, ftp)
+
+    files = local_files(args.repopath)
+    orphans = sweep(files, refs)
+    report('Repository', files, orphans)
+    if args.delete and orphans:
+        delete_local(args.repopath, orphans)
+
+    if ftp is not None:
+        files = remote_files(ftp)
+        remote_orphans = sweep(files, refs)
+        report('FTP server', files, remote_orphans)
+        if args.delete and remote_orphans:
+            delete_remote(ftp, remote_orphans)
+        ftp.quit()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
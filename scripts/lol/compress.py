@@ -0,0 +1,205 @@
+# Compression of the asset zips.
+#
+# Blends saved with compression (zstd or gzip) and blends which are mostly
+# JPG/PNG textures gain nothing from deflate. The compressibility of a blend is
+# estimated from a few sampled blocks: incompressible blends are stored, all
+# others are tried with every allowed zip method and the best one is kept
+# under a policy:
+#
+#   time  smallest download plus decompression time at --bandwidth (default)
+#   size  smallest zip
+#
+# Only stored and deflated zips are allowed by default, every client can read
+# them and lol.mirror verifies them while downloading. bzip2 and lzma can be
+# enabled with --methods for clients with a complete Python zipfile module.
+# Without --apply only the report is printed. The method is recorded in the zip
+# comment, the deflate level of zips written by other tools cannot be told.
+#
+#   python -m lol.compress <repopath> [--policy time|size] [--bandwidth MB/s] [--methods ...] [--jobs N] [--apply]
+
+import argparse
+import sys
+import tempfile
+import zipfile
+import zlib
+
+from concurrent.futures import ProcessPoolExecutor
+from os import replace
+from os.path import join, exists, getsize
+from shutil import copyfile
+from time import perf_counter
+
+from .audit import blend_member
+from .files import BLOCK_SIZE, lfs_pointer_size
+from .toc import version, toc_files, external_tocs, load_toc
+
+# name: (zip method, compression level)
+METHODS = {
+    'store': (zipfile.ZIP_STORED, None),
+    'deflate-1': (zipfile.ZIP_DEFLATED, 1),
+    'deflate-6': (zipfile.ZIP_DEFLATED, 6),
+    'deflate-9': (zipfile.ZIP_DEFLATED, 9),
+    'bzip2': (zipfile.ZIP_BZIP2, 9),
+    'lzma': (zipfile.ZIP_LZMA, None),
+}
+COMPATIBLE = ('store', 'deflate-1', 'deflate-6', 'deflate-9')
+DEFAULT = 'deflate-6'
+UNKNOWN_DEFLATE = 'deflate (level unknown)'
+METHOD_COMMENT = b'lol-method:'
+
+POLICIES = ('time', 'size')
+BANDWIDTH = 10  # MB/s assumed for the time policy
+MIN_GAIN = 0.02  # a zip is only rewritten if it gets this much better
+
+SAMPLE_BLOCKS = 8
+SAMPLE_SIZE = 1024 ** 2
+INCOMPRESSIBLE = 0.95  # sampled deflate ratio above which a blend is stored
+
+# blends saved with "Compress" start with the magic of their compressor instead of 'BLENDER'
+COMPRESSED_MAGIC = (b'\x28\xb5\x2f\xfd', b'\x1f\x8b')
+
+
+def compressibility(path):
+    # compressed / original size of evenly spaced samples at deflate level 1, 1.0 for compressed blends
+    size = getsize(path)
+    with open(path, 'rb') as file:
+        if file.read(4).startswith(COMPRESSED_MAGIC):
+            return 1.0
+        if size == 0:
+            return 1.0
+
+        step = max(SAMPLE_SIZE, size // SAMPLE_BLOCKS)
+        original = compressed = 0
+        for offset in range(0, size, step):
+            file.seek(offset)
+            block = file.read(SAMPLE_SIZE)
+            original += len(block)
+            compressed += len(zlib.compress(block, 1))
+    return compressed / original
+
+
+def quick_method(path):
+    # method without trying candidates, for publishing a single asset
+    return 'store' if compressibility(path) >= INCOMPRESSIBLE else DEFAULT
+
+
+def write_zip(blendpath, zippath, name, method=DEFAULT):
+    compress_type, level = METHODS[method]
+    with zipfile.ZipFile(zippath + '.tmp', mode='w') as zf:
+        zf.write(blendpath, name, compress_type=compress_type, compresslevel=level)
+        zf.comment = METHOD_COMMENT + method.encode()
+    replace(zippath + '.tmp', zippath)
+
+
+def zip_method(zippath, url):
+    # name of the method of the blend in a zip as recorded by write_zip, otherwise taken from
+    # the zip method, UNKNOWN_DEFLATE for deflate and None for methods not in METHODS
+    with zipfile.ZipFile(zippath) as zf:
+        info = zf.getinfo(blend_member(zf, url))
+        comment = zf.comment
+    if comment.startswith(METHOD_COMMENT):
+        method = comment[len(METHOD_COMMENT):].decode('ascii', 'replace')
+        if method in METHODS and METHODS[method][0] == info.compress_type:
+            return method
+    if info.compress_type == zipfile.ZIP_DEFLATED:
+        # Python's zipfile does not set the level flags, the level of a deflated zip is unknown
+        return UNKNOWN_DEFLATE
+    for name, (compress_type, level) in METHODS.items():
+        if compress_type == info.compress_type:
+            return name
+    return None
+
+
+def decode_time(zippath, url):
+    start = perf_counter()
+    with zipfile.ZipFile(zippath) as zf, zf.open(blend_member(zf, url)) as file:
+        while file.read(BLOCK_SIZE * 16):
+            pass
+    return perf_counter() - start
+
+
+def score(size, seconds, policy, bandwidth=BANDWIDTH):
+    if policy == 'size':
+        return size
+    return size / (bandwidth * 1024 ** 2) + seconds
+
+
+def optimize_zip(zippath, url, methods=COMPATIBLE, policy='time', bandwidth=BANDWIDTH, apply=False):
+    # Try the methods on the blend of one zip. Returns a dict with the current and the best
+    # method and their sizes, the zip is replaced if apply is set and the best one is better
+    # by more than MIN_GAIN.
+    with tempfile.TemporaryDirectory() as temp_dir_path:
+        with zipfile.ZipFile(zippath) as zf:
+            name = blend_member(zf, url)
+            blendpath = zf.extract(name, temp_dir_path)
+
+        current = {'method': zip_method(zippath, url), 'size': getsize(zippath), 'seconds': decode_time(zippath, url)}
+        ratio = compressibility(blendpath)
+        candidates = [method for method in methods if ratio < INCOMPRESSIBLE or method == 'store'] or ['store']
+
+        results = {}
+        for method in candidates:
+            path = join(temp_dir_path, method + '.zip')
+            write_zip(blendpath, path, name, method)
+            results[method] = {'method': method, 'size': getsize(path), 'seconds': decode_time(path, url)}
+        best = min(results.values(), key=lambda r: score(r['size'], r['seconds'], policy, bandwidth))
+
+        current_score = score(current['size'], current['seconds'], policy, bandwidth)
+        better = score(best['size'], best['seconds'], policy, bandwidth) < current_score * (1 - MIN_GAIN)
+        if apply and better:
+            copyfile(join(temp_dir_path, best['method'] + '.zip'), zippath + '.tmp')
+            replace(zippath + '.tmp', zippath)
+
+    return {'path': zippath, 'ratio': ratio, 'current': current, 'best': best if better else current, 'changed': better}
+
+
+def optimize_repository(repopath, methods=COMPATIBLE, policy='time', bandwidth=BANDWIDTH, workers=None, apply=False):
+    # all zips of the current TOCs, a zip shared by several TOCs is done once
+    jobs = {}
+    for filename, typedir in toc_files.items():
+        if filename in external_tocs:
+            continue
+        for asset in load_toc(join(repopath, version, filename)):
+            path = join(repopath, typedir, asset['url'])
+            if exists(path) and lfs_pointer_size(path) is None:
+                jobs[path] = asset['url']
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(optimize_zip, path, url, methods, policy, bandwidth, apply) for path, url in sorted(jobs.items())]
+        return [future.result() for future in futures]
+
+
+def report(results, applied=False):
+    before = sum(r['current']['size'] for r in results)
+    after = sum(r['best']['size'] for r in results)
+    methods = {}
+    for r in results:
+        methods[r['best']['method']] = methods.get(r['best']['method'], 0) + 1
+
+    lines = ['{0} zips: {1:.1f} MB -> {2:.1f} MB, {3:.1f} MB ({4:.1f}%) saved'.format(
+        len(results), before / 1024 ** 2, after / 1024 ** 2, (before - after) / 1024 ** 2, 100 * (before - after) / max(before, 1))]
+    lines.append('{0} zips {1}, {2} incompressible'.format(len([r for r in results if r['changed']]),
+                                                           'rewritten' if applied else 'to rewrite',
+                                                           len([r for r in results if r['ratio'] >= INCOMPRESSIBLE])))
+    for method, count in sorted(methods.items(), key=lambda m: -m[1]):
+        lines.append('  {0}: {1}'.format(method, count))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pick the best compression for every LoL zip')
+    parser.add_argument('repopath', help='LoL repository directory')
+    parser.add_argument('--policy', choices=POLICIES, default='time', help='what to minimize')
+    parser.add_argument('--bandwidth', type=float, default=BANDWIDTH, help='download speed in MB/s for the time policy')
+    parser.add_argument('--methods', nargs='+', choices=sorted(METHODS), default=list(COMPATIBLE), help='allowed zip methods')
+    parser.add_argument('--jobs', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--apply', action='store_true', help='rewrite the zips, otherwise only report')
+    args = parser.parse_args(argv)
+
+    results = optimize_repository(args.repopath, args.methods, args.policy, args.bandwidth, args.jobs, args.apply)
+    print(report(results, args.apply))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+# Render cost of an asset, recorded in its TOC entry as 'cost':
+#
+#   {'triangles', 'objects', 'materials', 'textures', 'texture_bytes', 'blend_size', 'zip_size'}
+#
+# triangles are counted per object, a mesh used by several objects counts for
+# every one of them. texture_bytes is the memory of the decoded images (width *
+# height * channels, 4 bytes per channel for float images). blend_size and
+# zip_size are the uncompressed and compressed size of the download. The
+# counts are taken by the Blender tool while the library of a new asset is
+# loaded anyway, this module has the parts which do not need Blender.
+
+# sort types of the tool which order by a cost field, heaviest first
+SORT_FIELDS = {
+    'TRIANGLES': 'triangles',
+    'TEXTURE_MEMORY': 'texture_bytes',
+    'DOWNLOAD_SIZE': 'zip_size',
+}
+
+
+def texture_bytes(width, height, channels, is_float=False):
+    return width * height * channels * (4 if is_float else 1)
+
+
+def _size(value):
+    for unit in ('B', 'KB', 'MB'):
+        if value < 1024:
+            return '{0:.0f} {1}'.format(value, unit)
+        value /= 1024
+    return '{0:.1f} GB'.format(value)
+
+
+def _count(value):
+    if value >= 10 ** 6:
+        return '{0:.1f}M'.format(value / 10 ** 6)
+    if value >= 10 ** 4:
+        return '{0:.0f}k'.format(value / 10 ** 3)
+    return str(value)
+
+
+def describe(cost):
+    # one line for the asset list
+    if not cost:
+        return 'Cost unknown'
+    parts = []
+    if 'triangles' in cost:
+        parts.append('{0} tris'.format(_count(cost['triangles'])))
+    if 'textures' in cost:
+        parts.append('{0} textures ({1})'.format(cost['textures'], _size(cost.get('texture_bytes', 0))))
+    if 'zip_size' in cost:
+        parts.append('{0} download'.format(_size(cost['zip_size'])))
+    elif 'blend_size' in cost:
+        parts.append('{0} blend'.format(_size(cost['blend_size'])))
+    return ', '.join(parts)
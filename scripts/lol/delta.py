@@ -0,0 +1,258 @@
+# Delta transfer of blends with content-defined chunking.
+#
+# A blend is cut where a rolling hash over the last WINDOW bytes matches a bit
+# pattern, so an edit only changes the chunks around it and the cut points move
+# with the content after an insertion. Chunks are stored zlib-compressed under
+# their sha256 in <type>/chunks/, the recipe <type>/recipes/<stem>.json lists
+# them in order:
+#
+#   {'hash': sha256 of the blend, 'size': bytes, 'chunks': [[sha256, size], ...]}
+#
+# An upload only sends the chunks missing from the chunk index of the server
+# (<type>/chunks/index.json) plus the recipe. The new TOC is uploaded as
+# <toc>.pending, clients keep the old TOC whose zips are all on the server.
+# assemble rebuilds the blend from a recipe, checks it against the TOC hash and
+# writes the zip, on the server or on any machine with a copy of the chunk
+# store. When all zips of a pending TOC are there it replaces the TOC:
+#
+#   python -m lol.delta assemble <root> [--toc assets_model.json ...]
+#   python -m lol.delta diff <old.blend> <new.blend>
+
+import argparse
+import hashlib
+import json
+import mmap
+import sys
+import tempfile
+import zipfile
+import zlib
+
+from os import replace
+from os.path import join, exists, getsize, splitext
+
+import numpy as np
+
+from . import audit
+from .toc import version, toc_files, external_tocs, load_toc
+
+CHUNK_DIR = 'chunks'
+RECIPE_DIR = 'recipes'
+CHUNK_INDEX = 'index.json'
+PENDING_SUFFIX = '.pending'
+
+WINDOW = 64
+MIN_CHUNK = 256 * 1024
+AVERAGE_BITS = 20  # about 1 MB between two cut points
+MAX_CHUNK = 4 * 1024 ** 2
+SCAN_BLOCK = 4 * 1024 ** 2
+
+# random value per byte, derived from sha256 so every version cuts the same way
+GEAR = np.array([int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], 'little') for i in range(256)], np.uint32)
+MIX = np.uint32(0x9E3779B1)
+
+
+def candidates(data, bits=AVERAGE_BITS):
+    # Positions after which a chunk may end. The hash of a position is the sum of the
+    # GEAR values of the WINDOW bytes up to it, mixed by a multiplication. Computed in
+    # blocks with NumPy, the sums are differences of a running sum.
+    values = np.frombuffer(data, np.uint8)
+    shift = np.uint32(32 - bits)
+    sums = np.empty(SCAN_BLOCK + WINDOW + 1, np.uint32)
+
+    result = []
+    for start in range(0, len(values), SCAN_BLOCK):
+        end = min(len(values), start + SCAN_BLOCK)
+        low = max(0, start - WINDOW + 1)
+        count = end - low
+
+        sums[0] = 0
+        np.cumsum(np.take(GEAR, values[low:end]), dtype=np.uint32, out=sums[1:count + 1])
+        window = sums[WINDOW:count + 1] - sums[0:count + 1 - WINDOW]
+        window *= MIX
+        window >>= shift
+        result.append(np.flatnonzero(window == 0) + low + WINDOW)
+
+    if not result:
+        return np.zeros(0, np.int64)
+    return np.concatenate(result)
+
+
+def boundaries(data):
+    # end offsets of the chunks, with MIN_CHUNK <= size <= MAX_CHUNK except for the last chunk
+    size = len(data)
+    cuts = []
+    position = 0
+    for cut in candidates(data).tolist():
+        while cut - position > MAX_CHUNK:
+            position += MAX_CHUNK
+            cuts.append(position)
+        if cut - position >= MIN_CHUNK:
+            cuts.append(cut)
+            position = cut
+
+    while size - position > MAX_CHUNK:
+        position += MAX_CHUNK
+        cuts.append(position)
+    if position < size:
+        cuts.append(size)
+    return cuts
+
+
+def chunk_path(sha):
+    return CHUNK_DIR + '/' + sha[:2] + '/' + sha + '.z'
+
+
+def recipe_path(url):
+    return RECIPE_DIR + '/' + splitext(url)[0] + '.json'
+
+
+def make_recipe(path, store_chunk=None):
+    # cut the file into chunks, store_chunk(sha256, data) is called for every chunk
+    recipe = {'hash': None, 'size': getsize(path), 'chunks': []}
+    file_hash = hashlib.sha256()
+    if recipe['size'] == 0:
+        recipe['hash'] = file_hash.hexdigest()
+        return recipe
+
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = 0
+        for end in boundaries(data):
+            chunk = data[start:end]
+            sha = hashlib.sha256(chunk).hexdigest()
+            file_hash.update(chunk)
+            recipe['chunks'].append([sha, end - start])
+            if store_chunk is not None:
+                store_chunk(sha, chunk)
+            start = end
+
+    recipe['hash'] = file_hash.hexdigest()
+    return recipe
+
+
+def compress_chunk(data):
+    return zlib.compress(data, 6)
+
+
+def assemble(recipe, read_chunk, target):
+    # Write the blend of a recipe to target, read_chunk(sha256) returns the stored chunk.
+    # Returns False and leaves target untouched if a chunk or the result does not match.
+    file_hash = hashlib.sha256()
+    with open(target + '.tmp', 'wb') as file:
+        for sha, size in recipe['chunks']:
+            chunk = zlib.decompress(read_chunk(sha))
+            if len(chunk) != size or hashlib.sha256(chunk).hexdigest() != sha:
+                return False
+            file.write(chunk)
+            file_hash.update(chunk)
+
+    if file_hash.hexdigest() != recipe['hash']:
+        return False
+    replace(target + '.tmp', target)
+    return True
+
+
+def load_chunk_index(filepath):
+    if not exists(filepath):
+        return set()
+    with open(filepath) as file_handle:
+        return set(json.loads(file_handle.read()))
+
+
+def dump_chunk_index(chunks):
+    return json.dumps(sorted(chunks))
+
+
+def assemble_zip(root, typedir, asset):
+    # rebuild the zip of asset from its recipe, returns None or an issue
+    with open(join(root, typedir, recipe_path(asset['url']))) as file_handle:
+        recipe = json.loads(file_handle.read())
+    if recipe['hash'] != asset['hash']:
+        return 'recipe does not match the TOC hash'
+
+    def read_chunk(sha):
+        with open(join(root, typedir, chunk_path(sha)), 'rb') as file:
+            return file.read()
+
+    stem = splitext(asset['url'])[0]
+    target = join(root, typedir, asset['url'])
+    with tempfile.TemporaryDirectory() as temp_dir_path:
+        blendpath = join(temp_dir_path, stem + '.blend')
+        try:
+            if not assemble(recipe, read_chunk, blendpath):
+                return audit.HASH_MISMATCH
+        except (FileNotFoundError, zlib.error):
+            return 'missing or broken chunk'
+
+        with zipfile.ZipFile(target + '.tmp', mode='w') as zf:
+            zf.write(blendpath, stem + '.blend', compress_type=zipfile.ZIP_DEFLATED)
+    replace(target + '.tmp', target)
+    return None
+
+
+def assemble_repository(root, filenames=None):
+    # Rebuild all zips which are missing or do not match the TOC but have a recipe. A pending
+    # TOC is checked instead of the TOC and published once all its zips are rebuilt.
+    # Returns {zip path: issue} of the zips which could not be rebuilt.
+    issues = {}
+    for filename in filenames or list(toc_files):
+        if filename in external_tocs:
+            continue
+        typedir = toc_files[filename]
+        tocpath = join(root, version, filename)
+        pending = exists(tocpath + PENDING_SUFFIX)
+        toc_issues = len(issues)
+        for asset in load_toc(tocpath + PENDING_SUFFIX if pending else tocpath):
+            path = typedir + '/' + asset['url']
+            if not exists(join(root, typedir, recipe_path(asset['url']))):
+                continue
+            issue, entry = audit.check_zip(join(root, path), asset['url'], None)
+            if issue is None and entry[2] == asset['hash']:
+                continue
+
+            issue = assemble_zip(root, typedir, asset)
+            print('{0}: {1}'.format(path, issue or 'rebuilt'))
+            if issue is not None:
+                issues[path] = issue
+
+        if pending and len(issues) == toc_issues:
+            replace(tocpath + PENDING_SUFFIX, tocpath)
+            print('{0}: published'.format(filename))
+        elif pending:
+            print('{0}: not published, {1} zips could not be rebuilt'.format(filename, len(issues) - toc_issues))
+    return issues
+
+
+def diff(old_path, new_path):
+    # (bytes of new_path in chunks which old_path already has, size of new_path)
+    old = {sha for sha, size in make_recipe(old_path)['chunks']}
+    recipe = make_recipe(new_path)
+    reused = sum(size for sha, size in recipe['chunks'] if sha in old)
+    return reused, recipe['size']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Content-defined chunking of LoL blends')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('assemble', help='rebuild zips from their recipes and chunks')
+    build.add_argument('root', help='directory with the server layout (v2.5/, model/, material/)')
+    build.add_argument('--toc', nargs='+', choices=sorted(toc_files), default=None, help='TOC files to check')
+
+    compare = commands.add_parser('diff', help='show how much of a new blend is covered by the chunks of an old one')
+    compare.add_argument('old', help='previous version of the blend')
+    compare.add_argument('new', help='new version of the blend')
+    args = parser.parse_args(argv)
+
+    if args.command == 'diff':
+        reused, size = diff(args.old, args.new)
+        print('{0:.1f} of {1:.1f} MB reused, {2:.1f} MB to upload'.format(reused / 1024 ** 2, size / 1024 ** 2,
+                                                                          (size - reused) / 1024 ** 2))
+        return 0
+
+    issues = assemble_repository(args.root, args.toc)
+    print('{0} zips could not be rebuilt'.format(len(issues)))
+    return 1 if issues else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
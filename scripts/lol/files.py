@@ -0,0 +1,36 @@
+import hashlib
+
+from os.path import getsize
+
+BLOCK_SIZE = 65536
+LFS_POINTER_PREFIX = b'version https://git-lfs'
+
+
+def hash_stream(file):
+    file_hash = hashlib.sha256()
+    block = file.read(BLOCK_SIZE)
+    while len(block) > 0:
+        file_hash.update(block)
+        block = file.read(BLOCK_SIZE)
+    return file_hash.hexdigest()
+
+
+def hash_file(filename):
+    with open(filename, 'rb') as file:
+        return hash_stream(file)
+
+
+def lfs_pointer_size(path):
+    # object size if path is an LFS pointer which was not checked out, otherwise None
+    if getsize(path) >= 1024:
+        return None
+
+    with open(path, 'rb') as file:
+        data = file.read()
+    if not data.startswith(LFS_POINTER_PREFIX):
+        return None
+
+    for line in data.decode('utf-8', 'replace').splitlines():
+        if line.startswith('size '):
+            return int(line[5:])
+    return 0
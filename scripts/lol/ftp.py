@@ -0,0 +1,135 @@
+from ftplib import FTP_TLS, Error, error_perm
+from io import BytesIO
+from time import monotonic
+
+from .files import BLOCK_SIZE, hash_stream
+
+FTP_HOST = 'ftp.luxcorerender.org'
+FTP_PORT = 21
+
+RETRIES = 5
+PART_SUFFIX = '.part'
+PROGRESS_INTERVAL = 0.5  # seconds between two progress callbacks
+
+
+def connect(username, password, host=FTP_HOST, port=FTP_PORT):
+    ftp = FTP_TLS()
+    ftp.connect(host, port)
+    ftp.login(username, password)
+    return ftp
+
+
+def read_file(ftp, path):
+    bytestream = BytesIO()
+    ftp.retrbinary(f'RETR {path}', bytestream.write)
+    return bytestream.getvalue()
+
+
+def list_files(ftp, path):
+    # recursive listing {relative path: size}, path is absolute on the server
+    files = {}
+    try:
+        entries = list(ftp.mlsd(path, facts=['type', 'size']))
+    except error_perm:
+        return files
+
+    for name, facts in entries:
+        if facts.get('type') == 'dir':
+            for subpath, size in list_files(ftp, path + '/' + name).items():
+                files[name + '/' + subpath] = size
+        elif facts.get('type') == 'file':
+            files[name] = int(facts.get('size', 0))
+    return files
+
+
+def remote_size(ftp, path):
+    # size of the file on the server, None if it does not exist
+    ftp.voidcmd('TYPE I')
+    try:
+        return ftp.size(path)
+    except error_perm:
+        return None
+
+
+def remote_digest(ftp, path):
+    # sha256 computed by the server (HASH or XSHA256), None if the server has no such command
+    for command in ('HASH', 'XSHA256'):
+        try:
+            if command == 'HASH':
+                ftp.sendcmd('OPTS HASH SHA-256')
+            response = ftp.sendcmd('{0} {1}'.format(command, path))
+        except error_perm:
+            continue
+        for word in response[4:].split():
+            if len(word) == 64:
+                return word.lower()
+    return None
+
+
+class _Progress:
+    def __init__(self, callback, done, total):
+        self.callback = callback
+        self.done = done
+        self.total = total
+        self.start = monotonic()
+        self.sent = 0
+        self.last = 0
+
+    def __call__(self, block):
+        self.done += len(block)
+        self.sent += len(block)
+        now = monotonic()
+        if self.callback is not None and (now - self.last >= PROGRESS_INTERVAL or self.done == self.total):
+            self.last = now
+            self.callback(self.done, self.total, self.sent / max(now - self.start, 1e-6))
+
+
+def upload(ftp, path, file, reconnect, progress=None, retries=RETRIES):
+    # Upload a seekable file to path through path + PART_SUFFIX. After a dropped connection
+    # reconnect() returns a new connection and the upload continues at the size the server
+    # reports. The file gets its final name only after its size and, if the server can
+    # compute it, its digest match. progress(bytes done, total bytes, bytes per second) is
+    # called while sending. Returns the connection in use, which may not be the one passed in.
+    file.seek(0, 2)
+    total = file.tell()
+    file.seek(0)
+    digest = hash_stream(file)
+    temp_path = path + PART_SUFFIX
+
+    for attempt in range(retries + 1):
+        try:
+            if ftp is None:
+                ftp = reconnect()
+
+            offset = remote_size(ftp, temp_path) or 0
+            if offset > total:
+                ftp.delete(temp_path)
+                offset = 0
+
+            file.seek(offset)
+            if offset < total:
+                command = 'APPE' if offset else 'STOR'
+                ftp.storbinary('{0} {1}'.format(command, temp_path), file, BLOCK_SIZE, _Progress(progress, offset, total))
+
+            remote = remote_digest(ftp, temp_path)
+            if remote_size(ftp, temp_path) != total or (remote is not None and remote != digest):
+                # the part on the server is broken, send the whole file again
+                ftp.delete(temp_path)
+                continue
+
+            try:
+                ftp.rename(temp_path, path)
+            except error_perm:
+                # servers which do not replace existing files on rename
+                ftp.delete(path)
+                ftp.rename(temp_path, path)
+            return ftp
+        except error_perm:
+            raise
+        except (OSError, EOFError, Error) as error:
+            print('Upload of {0} interrupted: {1}'.format(path, error))
+            if ftp is not None:
+                ftp.close()
+            ftp = None
+
+    raise IOError('Upload of {0} failed after {1} attempts'.format(path, retries + 1))
@@ -0,0 +1,396 @@
+# Mirror of the published assets, e.g. for render farm nodes.
+#
+# The TOC files are fetched from the server and compared against a local cache
+# directory with the layout of the repository. Zips which are missing or whose
+# blend does not match the TOC 'hash' are downloaded, previews only if they are
+# missing. Every file is downloaded to '<file>.part' first and resumed with an
+# HTTP range request or FTP REST after a failure. The blend inside the zip is
+# decompressed and hashed while the bytes arrive, the zip is only moved into
+# place if its digest matches the TOC. Verified digests are kept in the audit
+# cache, so `python -m lol.audit <cachepath>` works on the mirror as well.
+#
+#   python -m lol.mirror <cachepath> [--url URL] [--toc assets_model.json ...] [--jobs N]
+#
+# http(s):// and ftp(s):// urls are supported, any directory served with
+# `python -m http.server` and the repository layout can be used for testing.
+
+import argparse
+import bz2
+import ftplib
+import hashlib
+import struct
+import sys
+import threading
+import zipfile
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from os import makedirs, remove, replace, stat
+from os.path import join, dirname, exists, getsize, splitext
+from urllib.error import HTTPError
+from urllib.parse import quote, unquote, urlsplit
+from urllib.request import Request, urlopen
+
+from . import audit
+from .files import BLOCK_SIZE
+from .toc import version, toc_files, external_tocs, load_toc, preview_name
+
+DEFAULT_URL = 'https://www.luxcorerender.org/lol'
+TIMEOUT = 60
+RETRIES = 3
+
+NOT_FOUND = 'not found on server'
+DOWNLOAD_FAILED = 'download failed'
+
+LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+
+class NotFound(Exception):
+    pass
+
+
+class StreamDigest:
+    # sha256 of the blend in a zip, computed from the zip bytes in the order they arrive.
+    # Only the first member is read. If it is no deflated, bzip2 or stored blend with known size
+    # the zip is not streamable and has to be verified after the download.
+    def __init__(self):
+        self.header = b''
+        self.hash = hashlib.sha256()
+        self.decompressor = None
+        self.remaining = None
+        self.streamable = True
+        self.done = False
+
+    def update(self, data):
+        if self.done or not self.streamable:
+            return
+
+        if self.decompressor is None and self.remaining is None:
+            self.header += data
+            data = self._parse_header()
+            if data is None:
+                return
+
+        if self.decompressor is not None:
+            self.hash.update(self.decompressor.decompress(data))
+            self.done = self.decompressor.eof
+        else:
+            self.hash.update(data[:self.remaining])
+            self.remaining -= len(data[:self.remaining])
+            self.done = self.remaining == 0
+
+    def _parse_header(self):
+        # data after the local file header, None as long as the header is incomplete
+        if len(self.header) < LOCAL_HEADER.size:
+            return None
+        (signature, version_needed, flags, method, mtime, mdate, crc, compressed_size, size,
+         name_length, extra_length) = LOCAL_HEADER.unpack_from(self.header)
+        start = LOCAL_HEADER.size + name_length + extra_length
+        if len(self.header) < start:
+            return None
+
+        name = self.header[LOCAL_HEADER.size:LOCAL_HEADER.size + name_length].decode('utf-8', 'replace')
+        data = self.header[start:]
+        self.header = b''
+
+        if signature != LOCAL_HEADER_SIGNATURE or splitext(name)[1] != '.blend' or flags & 0x1:
+            self.streamable = False
+        elif method == zipfile.ZIP_DEFLATED:
+            self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        elif method == zipfile.ZIP_BZIP2:
+            self.decompressor = bz2.BZ2Decompressor()
+        elif method == zipfile.ZIP_STORED and not flags & 0x8 and compressed_size != 0xFFFFFFFF:
+            self.remaining = compressed_size
+        else:
+            self.streamable = False
+        return data
+
+    def hexdigest(self):
+        # None if the blend could not be hashed from the stream
+        if not self.streamable or not self.done:
+            return None
+        return self.hash.hexdigest()
+
+
+class HTTPSource:
+    def __init__(self, url, timeout=TIMEOUT):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def open(self, path, offset=0):
+        # (offset the data starts at, iterator over the data), the offset is 0 if the server ignored the range
+        request = Request(self.url + '/' + quote(path))
+        if offset:
+            request.add_header('Range', 'bytes={0}-'.format(offset))
+        try:
+            response = urlopen(request, timeout=self.timeout)
+        except HTTPError as error:
+            if error.code == 404:
+                raise NotFound(path)
+            if error.code == 416 and offset:
+                # the part file is not shorter than the file on the server, start over
+                return self.open(path, 0)
+            raise
+
+        start = offset if response.status == 206 else 0
+        return start, self._chunks(response)
+
+    def _chunks(self, response):
+        with response:
+            block = response.read(BLOCK_SIZE)
+            while len(block) > 0:
+                yield block
+                block = response.read(BLOCK_SIZE)
+
+    def close(self):
+        pass
+
+
+class FTPSource:
+    # one connection per worker thread
+    def __init__(self, url, timeout=TIMEOUT):
+        parts = urlsplit(url)
+        self.tls = parts.scheme == 'ftps'
+        self.host = parts.hostname
+        self.port = parts.port or 21
+        self.username = unquote(parts.username or 'anonymous')
+        self.password = unquote(parts.password or '')
+        self.root = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def connection(self):
+        ftp = getattr(self.local, 'ftp', None)
+        if ftp is None:
+            ftp = ftplib.FTP_TLS(timeout=self.timeout) if self.tls else ftplib.FTP(timeout=self.timeout)
+            ftp.connect(self.host, self.port)
+            ftp.login(self.username, self.password)
+            if self.tls:
+                ftp.prot_p()
+            ftp.voidcmd('TYPE I')
+            self.local.ftp = ftp
+            with self.lock:
+                self.connections.append(ftp)
+        return ftp
+
+    def open(self, path, offset=0):
+        ftp = self.connection()
+        try:
+            conn = ftp.transfercmd('RETR ' + self.root + '/' + path, rest=offset or None)
+        except ftplib.error_perm as error:
+            if str(error).startswith('550'):
+                raise NotFound(path)
+            raise
+        except (OSError, EOFError, ftplib.Error):
+            self.local.ftp = None
+            raise
+        return offset, self._chunks(ftp, conn)
+
+    def _chunks(self, ftp, conn):
+        try:
+            with conn:
+                block = conn.recv(BLOCK_SIZE)
+                while len(block) > 0:
+                    yield block
+                    block = conn.recv(BLOCK_SIZE)
+                if self.tls:
+                    conn.unwrap()
+            ftp.voidresp()
+        except (OSError, EOFError, ftplib.Error):
+            # the control connection is in an unknown state, the next attempt connects again
+            self.local.ftp = None
+            raise
+
+    def close(self):
+        for ftp in self.connections:
+            try:
+                ftp.quit()
+            except (OSError, EOFError, ftplib.Error):
+                ftp.close()
+        self.connections = []
+
+
+def source_for(url, timeout=TIMEOUT):
+    if urlsplit(url).scheme in ('ftp', 'ftps'):
+        return FTPSource(url, timeout)
+    return HTTPSource(url, timeout)
+
+
+def _feed_file(digest, path, size):
+    # the part already on disk, needed to continue the digest after a resume
+    with open(path, 'rb') as file:
+        while size > 0:
+            block = file.read(min(BLOCK_SIZE, size))
+            if not block:
+                break
+            digest.update(block)
+            size -= len(block)
+
+
+def download(source, path, target, expected=None, url=None, retries=RETRIES, resume=True):
+    # Download path to target through target.part. With expected the blend in the zip
+    # must have this sha256, a mismatch discards the part file.
+    # Returns (issue or None, bytes transferred, cache entry or None).
+    part = target + '.part'
+    makedirs(dirname(target), exist_ok=True)
+    if not resume and exists(part):
+        remove(part)
+
+    transferred = 0
+    issue = DOWNLOAD_FAILED
+    for attempt in range(retries + 1):
+        try:
+            offset = getsize(part) if exists(part) else 0
+            start, chunks = source.open(path, offset)
+
+            digest = StreamDigest() if expected is not None else None
+            with open(part, 'r+b' if start else 'wb') as file:
+                file.seek(start)
+                file.truncate()
+                if digest is not None and start:
+                    _feed_file(digest, part, start)
+                for chunk in chunks:
+                    file.write(chunk)
+                    transferred += len(chunk)
+                    if digest is not None:
+                        digest.update(chunk)
+        except NotFound:
+            return NOT_FOUND, transferred, None
+        except zlib.error:
+            # the part file does not continue the zip on the server
+            remove(part)
+            continue
+        except (OSError, EOFError, ftplib.Error) as error:
+            print('{0}: {1}, retrying'.format(path, error))
+            continue
+
+        if expected is None:
+            replace(part, target)
+            return None, transferred, None
+
+        hexdigest = digest.hexdigest()
+        if hexdigest is None:
+            try:
+                hexdigest = audit.zip_digest(part, url)
+            except zipfile.BadZipFile:
+                hexdigest = None
+        if hexdigest != expected:
+            # a part file from an older version of the zip is downloaded again, a complete download is not
+            remove(part)
+            issue = audit.HASH_MISMATCH
+            if start:
+                continue
+            return issue, transferred, None
+
+        replace(part, target)
+        st = stat(target)
+        return None, transferred, [st.st_size, st.st_mtime_ns, hexdigest]
+
+    return issue, transferred, None
+
+
+def fetch_toc(source, cachepath, filename):
+    # the TOC of the current release, written atomically to the cache
+    path = version + '/' + filename
+    issue, transferred, entry = download(source, path, join(cachepath, version, filename), resume=False)
+    if issue is not None:
+        return issue, []
+    return None, load_toc(join(cachepath, version, filename))
+
+
+def plan(cachepath, tocs, cache, workers=None):
+    # (path, expected hash or None, url) of every file which has to be downloaded
+    zips = {}
+    previews = {}
+    for filename, assets in tocs.items():
+        typedir = toc_files[filename]
+        for asset in assets:
+            if filename not in external_tocs:
+                zips.setdefault(typedir + '/' + asset['url'], (asset['hash'], asset['url']))
+            previews.setdefault(typedir + '/preview/' + preview_name(asset['url']), asset['url'])
+
+    # compare the local zips by digest, unchanged zips only cost a stat with the cache
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {path: executor.submit(audit.check_zip, join(cachepath, path), url, cache.get(path))
+                   for path, (hash, url) in zips.items()}
+        results = {path: future.result() for path, future in futures.items()}
+
+    jobs = []
+    for path, (hash, url) in sorted(zips.items()):
+        issue, entry = results[path]
+        if issue is None:
+            cache[path] = entry
+            if entry[2] == hash:
+                continue
+        jobs.append((path, hash, url))
+
+    for path, url in sorted(previews.items()):
+        if not exists(join(cachepath, path)):
+            jobs.append((path, None, url))
+    return jobs
+
+
+def mirror(url, cachepath, filenames=None, workers=4, cache=None):
+    # returns ({path: issue} of the files which could not be mirrored, bytes transferred)
+    if filenames is None:
+        filenames = list(toc_files)
+    if cache is None:
+        cache = {}
+
+    source = source_for(url)
+    issues = {}
+    transferred = 0
+    try:
+        tocs = {}
+        for filename in filenames:
+            issue, tocs[filename] = fetch_toc(source, cachepath, filename)
+            if issue is not None:
+                issues[version + '/' + filename] = issue
+
+        jobs = plan(cachepath, tocs, cache, workers)
+        print('{0} files to download'.format(len(jobs)))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {path: executor.submit(download, source, path, join(cachepath, path), hash, url)
+                       for (path, hash, url) in jobs}
+            for path, future in futures.items():
+                issue, size, entry = future.result()
+                transferred += size
+                if entry is not None:
+                    cache[path] = entry
+                if issue is not None:
+                    issues[path] = issue
+    finally:
+        source.close()
+
+    return issues, transferred
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mirror the published LoL assets into a local directory')
+    parser.add_argument('cachepath', help='local directory, uses the layout of the repository')
+    parser.add_argument('--url', default=DEFAULT_URL, help='http(s):// or ftp(s):// url of the asset server')
+    parser.add_argument('--toc', nargs='+', choices=sorted(toc_files), default=None, help='TOC files to mirror')
+    parser.add_argument('--jobs', type=int, default=4, help='number of parallel downloads')
+    parser.add_argument('--no-cache', action='store_true', help='verify every local zip again')
+    args = parser.parse_args(argv)
+
+    makedirs(args.cachepath, exist_ok=True)
+    cache = {} if args.no_cache else audit.load_cache(args.cachepath)
+    try:
+        issues, transferred = mirror(args.url, args.cachepath, args.toc, args.jobs, cache)
+    finally:
+        audit.save_cache(args.cachepath, cache)
+
+    for path, issue in sorted(issues.items()):
+        print('{0}: {1}'.format(path, issue))
+    print('{0:.1f} MB downloaded, {1} files failed'.format(transferred / 1024 ** 2, len(issues)))
+
+    return 1 if issues else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,325 @@
+# Pack files for many small assets.
+#
+# All zips and previews of a category are concatenated into a few pack files of
+# up to PACK_SIZE bytes. Every pack ends with its own index and a fixed size
+# footer, so a single pack can be read without anything else:
+#
+#   member data ... | index (JSON: {name: [offset, length, sha256]}) | footer
+#   footer = MAGIC, index offset, index length (little endian uint64)
+#
+# Names are repository paths like 'material/preview/Oak.jpg'. The packs of a TOC
+# are written to <type>/pack/<toc>/ together with index.json:
+# {'packs': {pack: {'size', 'sha256', 'files'}}, 'files': {name: [pack, offset, length, sha256]}}
+# With this index one member is a single read, via mmap from a local pack or a
+# HTTP range request from the server.
+#
+#   python -m lol.pack build <repopath> [--pack-size MB]
+#   python -m lol.pack extract <pack file or url> <name> [--output path]
+
+import argparse
+import hashlib
+import json
+import mmap
+import struct
+import sys
+
+from os import makedirs, replace, stat
+from os.path import join, exists, basename, splitext
+from urllib.request import Request, urlopen
+
+from .files import BLOCK_SIZE, lfs_pointer_size
+from .toc import version, toc_files, external_tocs, load_toc, preview_name
+
+PACK_DIR = 'pack'
+PACK_INDEX = 'index.json'
+PACK_EXTENSION = '.lolpack'
+PACK_SIZE = 256 * 1024 ** 2
+
+MAGIC = b'LOLPACK1'
+FOOTER = struct.Struct('<8sQQ')
+
+
+class PackError(Exception):
+    pass
+
+
+def pack_dir(toc_filename):
+    # relative to the asset directory, one pack set per TOC file
+    return join(PACK_DIR, splitext(toc_filename)[0])
+
+
+def _pack_name(category, number):
+    name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in category)
+    return '{0}_{1}{2}'.format(name, number, PACK_EXTENSION)
+
+
+def write_pack(path, members):
+    # members: [(name, file path)], returns ({name: [offset, length, sha256]}, pack sha256, pack size)
+    index = {}
+    pack_hash = hashlib.sha256()
+    offset = 0
+    with open(path + '.tmp', 'wb') as pack:
+        for name, filepath in members:
+            member_hash = hashlib.sha256()
+            with open(filepath, 'rb') as file:
+                block = file.read(BLOCK_SIZE)
+                while len(block) > 0:
+                    pack.write(block)
+                    member_hash.update(block)
+                    pack_hash.update(block)
+                    block = file.read(BLOCK_SIZE)
+            length = pack.tell() - offset
+            index[name] = [offset, length, member_hash.hexdigest()]
+            offset += length
+
+        tail = json.dumps(index).encode('utf-8')
+        tail += FOOTER.pack(MAGIC, offset, len(tail))
+        pack.write(tail)
+        pack_hash.update(tail)
+        size = pack.tell()
+    replace(path + '.tmp', path)
+    return index, pack_hash.hexdigest(), size
+
+
+def read_footer(data, size):
+    # (index offset, index length) from the last FOOTER.size bytes of a pack of the given size
+    if len(data) != FOOTER.size:
+        raise PackError('pack too short')
+    magic, offset, length = FOOTER.unpack(data)
+    if magic != MAGIC or offset + length + FOOTER.size != size:
+        raise PackError('not a pack file')
+    return offset, length
+
+
+def _verify(name, data, digest):
+    if hashlib.sha256(data).hexdigest() != digest:
+        raise PackError('{0}: checksum mismatch'.format(name))
+    return data
+
+
+class PackFile:
+    # local pack, members are slices of a read-only memory map
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        size = stat(path).st_size
+        if size < FOOTER.size:
+            self.file.close()
+            raise PackError('pack too short')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        offset, length = read_footer(self.map[size - FOOTER.size:], size)
+        self.index = json.loads(self.map[offset:offset + length].decode('utf-8'))
+
+    def read(self, name, verify=True):
+        offset, length, digest = self.index[name]
+        data = self.map[offset:offset + length]
+        return _verify(name, data, digest) if verify else data
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+
+class HTTPPack:
+    # remote pack, every member is one range request. Without an index from
+    # index.json the footer and the index of the pack are requested first.
+    def __init__(self, url, index=None, timeout=60):
+        self.url = url
+        self.timeout = timeout
+        if index is None:
+            footer, size = self._range(-FOOTER.size)
+            offset, length = read_footer(footer, size)
+            index = json.loads(self._range(offset, length)[0].decode('utf-8'))
+        self.index = index
+
+    def _range(self, offset, length=None):
+        # (data, size of the pack), a negative offset requests the last bytes
+        request = Request(self.url)
+        if offset < 0:
+            request.add_header('Range', 'bytes={0}'.format(offset))
+        else:
+            request.add_header('Range', 'bytes={0}-{1}'.format(offset, offset + length - 1))
+
+        with urlopen(request, timeout=self.timeout) as response:
+            data = response.read()
+            if response.status == 206:
+                size = int(response.headers.get('Content-Range', '/0').split('/')[-1])
+                return data, size
+
+        # the server ignored the range and sent the whole pack
+        size = len(data)
+        if offset < 0:
+            return data[offset:], size
+        return data[offset:offset + length], size
+
+    def read(self, name, verify=True):
+        offset, length, digest = self.index[name]
+        data = self._range(offset, length)[0]
+        return _verify(name, data, digest) if verify else data
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+
+def open_pack(path_or_url, index=None):
+    if path_or_url.startswith(('http://', 'https://')):
+        return HTTPPack(path_or_url, index)
+    return PackFile(path_or_url)
+
+
+def member_index(index, pack):
+    # the index of one pack from index.json, as stored in the pack itself
+    return {name: entry[1:] for name, entry in index['files'].items() if entry[0] == pack}
+
+
+def read_file(location, index, name, verify=True):
+    # one file from the packs of a TOC, location is the local pack directory or its url
+    pack = index['files'][name][0]
+    if location.startswith(('http://', 'https://')):
+        reader = HTTPPack(location.rstrip('/') + '/' + pack, member_index(index, pack))
+    else:
+        reader = PackFile(join(location, pack))
+    with reader:
+        return reader.read(name, verify)
+
+
+def load_index(repopath, toc_filename):
+    index_path = join(repopath, toc_files[toc_filename], pack_dir(toc_filename), PACK_INDEX)
+    if not exists(index_path):
+        return None
+    with open(index_path) as file_handle:
+        return json.loads(file_handle.read())
+
+
+def pack_files(index, toc_filename):
+    # relative to the asset directory
+    directory = pack_dir(toc_filename)
+    return [join(directory, PACK_INDEX)] + [join(directory, name) for name in sorted(index['packs'])]
+
+
+def _members(repopath, toc_filename, assets):
+    # {category: [(name, file path, size)]} of all files of the TOC which are in the repository
+    typedir = toc_files[toc_filename]
+    categories = {}
+    for asset in sorted(assets, key=lambda c: c['name'].lower()):
+        names = [typedir + '/preview/' + preview_name(asset['url'])]
+        if toc_filename not in external_tocs:
+            names.insert(0, typedir + '/' + asset['url'])
+
+        for name in names:
+            filepath = join(repopath, name)
+            if not exists(filepath) or lfs_pointer_size(filepath) is not None:
+                continue
+            categories.setdefault(asset['category'], []).append((name, filepath, stat(filepath)))
+    return categories
+
+
+def _unchanged(previous, directory, pack, members):
+    # a pack is kept if it has the same members and none of them changed after it was written
+    if previous is None or pack not in previous['packs'] or not exists(join(directory, pack)):
+        return False
+    if previous['packs'][pack]['files'] != [name for name, filepath, st in members]:
+        return False
+    pack_mtime = stat(join(directory, pack)).st_mtime_ns
+    for name, filepath, st in members:
+        if previous['files'][name][2] != st.st_size or st.st_mtime_ns > pack_mtime:
+            return False
+    return True
+
+
+def build_packs(repopath, toc_filename, assets, pack_size=PACK_SIZE):
+    # Write the packs of a TOC and its index.json, packs whose members did not change are kept.
+    # Returns (index, names of the packs written)
+    directory = join(repopath, toc_files[toc_filename], pack_dir(toc_filename))
+    makedirs(directory, exist_ok=True)
+    previous = load_index(repopath, toc_filename)
+
+    index = {'packs': {}, 'files': {}}
+    written = []
+    for category, members in sorted(_members(repopath, toc_filename, assets).items()):
+        groups = [[]]
+        size = 0
+        for member in members:
+            if groups[-1] and size + member[2].st_size > pack_size:
+                groups.append([])
+                size = 0
+            groups[-1].append(member)
+            size += member[2].st_size
+
+        for number, group in enumerate(groups):
+            pack = _pack_name(category, number)
+            if _unchanged(previous, directory, pack, group):
+                index['packs'][pack] = previous['packs'][pack]
+                for name, filepath, st in group:
+                    index['files'][name] = previous['files'][name]
+                continue
+
+            pack_index, digest, size = write_pack(join(directory, pack), [(name, filepath) for name, filepath, st in group])
+            index['packs'][pack] = {'size': size, 'sha256': digest, 'files': [name for name, filepath, st in group]}
+            for name, entry in pack_index.items():
+                index['files'][name] = [pack] + entry
+            written.append(pack)
+
+    temp_path = join(directory, PACK_INDEX + '.tmp')
+    with open(temp_path, 'w') as file:
+        file.write(json.dumps(index, indent=2))
+    replace(temp_path, join(directory, PACK_INDEX))
+
+    return index, written
+
+
+def update_repository(repopath, pack_size=PACK_SIZE):
+    for filename in toc_files:
+        assets = load_toc(join(repopath, version, filename))
+        if not assets:
+            continue
+        index, written = build_packs(repopath, filename, assets, pack_size)
+        print('{0}: {1} files in {2} packs, {3} written'.format(filename, len(index['files']), len(index['packs']), len(written)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build and read LoL pack files')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='pack the assets of all TOC files of the repository')
+    build.add_argument('repopath', help='LoL repository directory')
+    build.add_argument('--pack-size', type=int, default=PACK_SIZE // 1024 ** 2, help='maximum pack size in MB')
+
+    extract = commands.add_parser('extract', help='extract one file from a local or remote pack')
+    extract.add_argument('pack', help='pack file or http(s) url of a pack')
+    extract.add_argument('name', help='name of the file in the pack, e.g. material/Oak.zip')
+    extract.add_argument('--output', help='target path, default is the file name in the current directory')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        update_repository(args.repopath, args.pack_size * 1024 ** 2)
+        return 0
+
+    with open_pack(args.pack) as pack:
+        if args.name not in pack.index:
+            print('{0} is not in {1}'.format(args.name, args.pack))
+            return 1
+        data = pack.read(args.name)
+
+    output = args.output or basename(args.name)
+    with open(output + '.tmp', 'wb') as file:
+        file.write(data)
+    replace(output + '.tmp', output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# Lightweight proxies of heavy models.
+#
+# A model with more than the triangle budget gets a decimated copy for layout
+# work, published next to the full asset as <type>/proxy/<url>. The zip holds
+# <name>.blend like the full asset, the TOC entry gets the sha256 of that blend
+# as 'proxy_hash' and its triangle count as 'proxy_triangles'. Models within
+# the budget have no proxy.
+#
+# The decimation runs in background Blender processes with ProxyWorker.py, one
+# per model, so the process running this module does not need bpy:
+#
+#   python -m lol.proxy <repopath> --blender <path to blender> [--budget N] [--jobs N] [--force]
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+from concurrent.futures import ThreadPoolExecutor
+from os import makedirs, replace
+from os.path import join, dirname, exists, splitext
+
+from . import audit
+from .files import hash_file, lfs_pointer_size
+from .toc import version, toc_files, external_tocs, load_toc
+
+PROXY_DIR = 'proxy'
+TRIANGLE_BUDGET = 20000
+WORKER = join(dirname(dirname(__file__)), 'ProxyWorker.py')
+RESULT = 'LOL_PROXY_RESULT '
+
+
+def proxy_path(url):
+    # relative to the asset directory
+    return PROXY_DIR + '/' + url
+
+
+def make_proxy(blender, src, dst, budget=TRIANGLE_BUDGET):
+    # Decimate the blend src to dst in a background Blender. Returns the result of
+    # ProxyWorker.py, dst is only written if the model has more than budget triangles.
+    command = [blender, '-b', '--factory-startup', '--python-exit-code', '1',
+               '--python', WORKER, '--', src, dst, str(budget)]
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT):
+            return json.loads(line[len(RESULT):])
+    raise RuntimeError('Proxy of {0} failed:\n{1}'.format(src, process.stdout[-2000:]))
+
+
+def build_proxy(blender, src, target, budget=TRIANGLE_BUDGET):
+    # Write the proxy zip of the blend src to target. Returns the TOC fields of the
+    # proxy, an empty dict if the model is within the budget.
+    stem = splitext(target)[0].replace('\\', '/').split('/')[-1]
+    with tempfile.TemporaryDirectory() as temp_dir_path:
+        blendpath = join(temp_dir_path, stem + '.blend')
+        result = make_proxy(blender, src, blendpath, budget)
+        if not exists(blendpath):
+            return {}
+
+        makedirs(dirname(target), exist_ok=True)
+        with zipfile.ZipFile(target + '.tmp', mode='w') as zf:
+            zf.write(blendpath, stem + '.blend', compress_type=zipfile.ZIP_DEFLATED)
+        replace(target + '.tmp', target)
+        return {'proxy_hash': hash_file(blendpath), 'proxy_triangles': result['proxy_triangles']}
+
+
+def _build_proxy_or_skip(blender, src, target, budget):
+    # a failed decimation leaves the model without a proxy instead of stopping the other jobs
+    try:
+        return build_proxy(blender, src, target, budget)
+    except (RuntimeError, OSError) as error:
+        print('Proxy of {0} skipped: {1}'.format(src, error))
+        return {}
+
+
+def build_proxies(blender, jobs, budget=TRIANGLE_BUDGET, workers=None):
+    # jobs: list of (blend file, target zip), returns the TOC fields per job in the same order,
+    # an empty dict for models within the budget and for failed jobs.
+    # Every job is a Blender process of its own, threads are enough to run them in parallel.
+    if workers == 1 or len(jobs) < 2:
+        return [_build_proxy_or_skip(blender, src, target, budget) for (src, target) in jobs]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_build_proxy_or_skip, blender, src, target, budget) for (src, target) in jobs]
+        return [future.result() for future in futures]
+
+
+def _extract_blend(zippath, url, directory):
+    with zipfile.ZipFile(zippath) as zf:
+        member = audit.blend_member(zf, url)
+        if member is None:
+            return None
+        return zf.extract(member, directory)
+
+
+def update_repository(repopath, blender, budget=TRIANGLE_BUDGET, workers=None, force=False):
+    # Create the missing proxies of all model TOCs and write their fields into the TOC files
+    for filename, typedir in toc_files.items():
+        if typedir != 'model' or filename in external_tocs:
+            continue
+        tocpath = join(repopath, version, filename)
+        assets = load_toc(tocpath)
+
+        with tempfile.TemporaryDirectory() as temp_dir_path:
+            jobs = []
+            todo = []
+            for asset in assets:
+                target = join(repopath, typedir, proxy_path(asset['url']))
+                if not force and 'proxy_hash' in asset and exists(target):
+                    continue
+                zippath = join(repopath, typedir, asset['url'])
+                if not exists(zippath) or lfs_pointer_size(zippath) is not None:
+                    continue
+                src = _extract_blend(zippath, asset['url'], join(temp_dir_path, str(len(jobs))))
+                if src is None:
+                    continue
+                jobs.append((src, target))
+                todo.append(asset)
+
+            results = build_proxies(blender, jobs, budget, workers)
+
+        for asset, fields in zip(todo, results):
+            asset.pop('proxy_hash', None)
+            asset.pop('proxy_triangles', None)
+            asset.update(fields)
+
+        if todo:
+            with open(tocpath + '.tmp', 'w') as file:
+                file.write(json.dumps(assets, indent=2))
+            replace(tocpath + '.tmp', tocpath)
+        print('{0}: {1} models checked, {2} proxies written'.format(filename, len(todo), len([r for r in results if r])))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Create decimated proxies of LoL models')
+    parser.add_argument('repopath', help='LoL repository directory')
+    parser.add_argument('--blender', required=True, help='Blender executable used for the decimation')
+    parser.add_argument('--budget', type=int, default=TRIANGLE_BUDGET, help='triangles of a proxy')
+    parser.add_argument('--jobs', type=int, default=None, help='number of Blender processes')
+    parser.add_argument('--force', action='store_true', help='recreate existing proxies')
+    args = parser.parse_args(argv)
+
+    update_repository(args.repopath, args.blender, args.budget, args.jobs, args.force)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
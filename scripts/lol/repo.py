@@ -0,0 +1,34 @@
+import subprocess
+
+from os.path import join, exists
+
+from . import trace
+
+REPO_URL = 'https://github.com/LuxCoreRender/LoL.git'
+
+
+def is_repository(repopath):
+    return exists(join(repopath, '.git'))
+
+
+def run(args, repopath=None):
+    with trace.span(' '.join(args[:2])):
+        process = subprocess.run(args, cwd=repopath, stdout=subprocess.PIPE)
+    return process.stdout.decode('utf-8', 'replace')
+
+
+def clone(repopath):
+    if repopath[-1] in '\\/':
+        repopath = repopath[:-1]
+    print(run(['git', 'clone', REPO_URL, repopath]))
+
+
+def fetch_lfs(repopath):
+    # replace the LFS pointers by the real files
+    print(run(['git-lfs', 'fetch'], repopath))
+    print(run(['git-lfs', 'checkout'], repopath))
+
+
+def sync(repopath):
+    print(run(['git', 'pull'], repopath))
+    fetch_lfs(repopath)
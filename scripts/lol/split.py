@@ -0,0 +1,80 @@
+# Cache for splitting material packs into one blend per material.
+#
+# For every source blend in the drop folder the cache stores its size and mtime
+# together with the blends split from it, their hashes and render costs. As long as neither
+# the source nor the split files changed, the intake reuses the hashes and does
+# not load, write or read any blend again. When the source changed, every split
+# file also keeps the fingerprint of its material datablock: only the materials
+# whose fingerprint changed are written again. Paths are relative to the drop
+# folder with '/' separators.
+
+import json
+
+from os import stat, replace
+from os.path import join, isfile, relpath, normpath
+
+CACHE_FILE = '.lol_split_cache.json'
+
+
+def _stat_key(path):
+    try:
+        st = stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+class SplitCache:
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.entries = {}
+        if isfile(join(filepath, CACHE_FILE)):
+            with open(join(filepath, CACHE_FILE)) as file_handle:
+                entries = json.loads(file_handle.read())
+            # entries written before the material fingerprints were kept are split again
+            self.entries = {key: entry for key, entry in entries.items()
+                            if all(len(item) == 5 for item in entry['materials'].values())}
+
+    def _key(self, path):
+        return relpath(path, self.filepath).replace('\\', '/')
+
+    def lookup(self, blendpath):
+        # {material name: hash} if blendpath and all files split from it are unchanged, otherwise None
+        entry = self.entries.get(self._key(blendpath))
+        if entry is None or entry['key'] != _stat_key(blendpath):
+            return None
+
+        hashes = {}
+        for name, (path, size, mtime, hash, fingerprint) in entry['materials'].items():
+            if _stat_key(join(self.filepath, path)) != [size, mtime]:
+                return None
+            hashes[name] = hash
+        return hashes
+
+    def previous(self, blendpath):
+        # {material name: (path, hash, fingerprint)} of the files of the last split of blendpath
+        # which are unchanged on disk, whether the source changed or not
+        entry = self.entries.get(self._key(blendpath), {'materials': {}})
+        files = {}
+        for name, (path, size, mtime, hash, fingerprint) in entry['materials'].items():
+            path = normpath(join(self.filepath, path))
+            if _stat_key(path) == [size, mtime]:
+                files[name] = (path, hash, fingerprint)
+        return files
+
+    def costs(self, blendpath):
+        # {material name: cost} stored with the split files, see lol.cost
+        return self.entries.get(self._key(blendpath), {}).get('costs', {})
+
+    def store(self, blendpath, materials, costs=None):
+        # materials: {material name: (path of its blend, hash, fingerprint)}, costs: {material name: cost}
+        entry = {'key': _stat_key(blendpath), 'materials': {}, 'costs': costs or {}}
+        for name, (path, hash, fingerprint) in materials.items():
+            entry['materials'][name] = [self._key(path)] + _stat_key(path) + [hash, fingerprint]
+        self.entries[self._key(blendpath)] = entry
+
+    def save(self):
+        filepath = join(self.filepath, CACHE_FILE)
+        with open(filepath + '.tmp', 'w') as file:
+            file.write(json.dumps(self.entries, indent=2))
+        replace(filepath + '.tmp', filepath)
@@ -0,0 +1,387 @@
+# Columnar store for the asset catalog.
+#
+# One row per TOC entry. Categories and dates are interned, hashes are kept as
+# 32 raw bytes and bounding boxes as float32, all in NumPy arrays. Only names,
+# urls, the thumbnails of assets added in this session and optional TOC fields
+# (e.g. proxy_hash) are Python objects. The Blender tool only creates
+# PropertyGroups for the rows it shows.
+#
+# Changes made inside a transaction are logged as their inverse (the previous
+# value of a field, the flags of a row or the number of rows before an append)
+# and can be undone and redone, a step costs memory in the number of changed
+# rows, not in the size of the catalog.
+#
+# CatalogCache keeps the store of every TOC file loaded in the session. A TOC is
+# only parsed again if its size or mtime changed, e.g. after a git pull, and the
+# unsaved changes of the cached store are carried over to the new one.
+
+import numpy as np
+
+from contextlib import contextmanager
+from os import stat
+from itertools import chain
+
+from .cost import SORT_FIELDS
+
+NEW = 1
+DELETED = 2
+
+HASH_SIZE = 32
+
+UNDO_STEPS = 64
+
+# TOC fields with a column, all other fields of an entry are kept in extras
+COLUMNS = frozenset(('name', 'url', 'category', 'hash', 'date', 'bbox_min', 'bbox_max'))
+
+
+class CatalogStore:
+    def __init__(self, asset_type='MODEL'):
+        self.asset_type = asset_type
+        self.clear()
+
+    def clear(self):
+        self.names = []
+        self.urls = []
+        self.categories = []
+        self.dates = []
+        self.thumbnails = {}  # row -> image path, only for assets added in this session
+        self.extras = {}  # row -> {field: value} of the optional TOC fields
+        self.edited = set()  # rows of the loaded TOC changed in this session
+        self._category_index = {}
+        self._date_index = {}
+        self._size = 0
+        self._allocate(0)
+        self.undo_stack = []  # (label, inverse changes, data, edited rows before) per transaction
+        self.redo_stack = []
+        self._log = None
+
+    def _allocate(self, capacity):
+        self.category_ids = np.zeros(capacity, np.uint16)
+        self.date_ids = np.zeros(capacity, np.uint16)
+        self.hashes = np.zeros((capacity, HASH_SIZE), np.uint8)
+        self.bbox = np.zeros((capacity, 2, 3), np.float32)
+        self.flags = np.zeros(capacity, np.uint8)
+
+    def _grow(self, size):
+        if size <= len(self.flags):
+            return
+        capacity = max(size, 2 * len(self.flags), 64)
+        for name in ('category_ids', 'date_ids', 'hashes', 'bbox', 'flags'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _intern(self, values, index, value):
+        if value not in index:
+            index[value] = len(values)
+            values.append(value)
+        return index[value]
+
+    def __len__(self):
+        return self._size
+
+    @classmethod
+    def from_toc(cls, entries, asset_type='MODEL'):
+        store = cls(asset_type)
+        store.extend(entries)
+        return store
+
+    def extend(self, entries, flags=0):
+        # bulk load of TOC entries, columns are filled at once
+        start = self._size
+        if self._log is not None:
+            self._log.append(('truncate', start))
+        count = len(entries)
+        self._grow(start + count)
+        rows = slice(start, start + count)
+
+        self.names += [entry['name'] for entry in entries]
+        self.urls += [entry['url'] for entry in entries]
+        self.category_ids[rows] = [self._intern(self.categories, self._category_index, entry['category']) for entry in entries]
+        self.date_ids[rows] = [self._intern(self.dates, self._date_index, entry.get('date', '')) for entry in entries]
+        hashes = bytes.fromhex(''.join(entry['hash'] or '0' * 2 * HASH_SIZE for entry in entries))
+        self.hashes[rows] = np.frombuffer(hashes, np.uint8).reshape(count, HASH_SIZE)
+        if self.asset_type == 'MODEL' and count:
+            bbox = chain.from_iterable(chain(entry.get('bbox_min', (0, 0, 0)), entry.get('bbox_max', (1, 1, 1))) for entry in entries)
+            self.bbox[rows] = np.fromiter(bbox, np.float32, 6 * count).reshape(count, 2, 3)
+        self.flags[rows] = flags
+
+        for row, entry in enumerate(entries, start):
+            extra = {key: value for key, value in entry.items() if key not in COLUMNS}
+            if extra:
+                self.extras[row] = extra
+
+        self._size += count
+        self._sort_keys = None
+        return range(start, start + count)
+
+    def append(self, entry, flags=0, thumbnail=None):
+        row = self.extend([entry], flags)[0]
+        if thumbnail:
+            self.thumbnails[row] = thumbnail
+        return row
+
+    def get(self, row):
+        # the row as TOC entry
+        entry = {
+            'name': self.names[row],
+            'url': self.urls[row],
+            'category': self.categories[self.category_ids[row]],
+            'hash': self.hashes[row].tobytes().hex(),
+            'date': self.dates[self.date_ids[row]],
+        }
+        if self.asset_type == 'MODEL':
+            entry['bbox_min'] = self.bbox[row, 0].tolist()
+            entry['bbox_max'] = self.bbox[row, 1].tolist()
+        entry.update(self.extras.get(row, {}))
+        return entry
+
+    def value(self, row, key):
+        if key == 'thumbnail':
+            return self.thumbnails.get(row)
+        return self.get(row).get(key)
+
+    def set(self, row, key, value):
+        if self._log is not None:
+            self._log.append(('set', row, key, self.value(row, key)))
+        if not self.is_new(row):
+            self.edited.add(row)
+
+        if key == 'name':
+            self.names[row] = value
+            self._sort_keys = None
+        elif key == 'url':
+            self.urls[row] = value
+        elif key == 'category':
+            self.category_ids[row] = self._intern(self.categories, self._category_index, value)
+            self._sort_keys = None
+        elif key == 'date':
+            self.date_ids[row] = self._intern(self.dates, self._date_index, value)
+        elif key == 'hash':
+            self.hashes[row] = np.frombuffer(bytes.fromhex(value or '0' * 2 * HASH_SIZE), np.uint8)
+        elif key == 'bbox_min':
+            self.bbox[row, 0] = value
+        elif key == 'bbox_max':
+            self.bbox[row, 1] = value
+        elif key == 'thumbnail' and value is None:
+            self.thumbnails.pop(row, None)
+        elif key == 'thumbnail':
+            self.thumbnails[row] = value
+        elif value is None:
+            self.extras.get(row, {}).pop(key, None)
+        else:
+            self.extras.setdefault(row, {})[key] = value
+
+    def is_new(self, row):
+        return bool(self.flags[row] & NEW)
+
+    def is_deleted(self, row):
+        return bool(self.flags[row] & DELETED)
+
+    def set_deleted(self, row, deleted=True):
+        if self._log is not None:
+            self._log.append(('flags', row, int(self.flags[row])))
+        if not self.is_new(row):
+            self.edited.add(row)
+        if deleted:
+            self.flags[row] |= DELETED
+        else:
+            self.flags[row] &= ~np.uint8(DELETED)
+
+    def truncate(self, size):
+        # remove the rows from size on, returns what extend needs to restore them
+        rows = range(size, self._size)
+        removed = ([self.get(row) for row in rows], self.flags[size:self._size].copy(),
+                   {row - size: self.thumbnails.pop(row) for row in rows if row in self.thumbnails})
+        for row in rows:
+            self.extras.pop(row, None)
+            self.edited.discard(row)
+        del self.names[size:]
+        del self.urls[size:]
+        self.flags[size:self._size] = 0
+        self._size = size
+        self._sort_keys = None
+        return removed
+
+    def dirty(self):
+        # True if the store has changes which are not in its TOC file
+        return bool(self.edited) or bool(self.flags[:self._size].any())
+
+    def carry_edits(self, old):
+        # Apply the session changes of old, a store of an older version of the same TOC.
+        # Edited rows are found by url, returns the number of edits whose asset is gone.
+        rows = {url: row for row, url in enumerate(self.urls)}
+        lost = 0
+        for row in sorted(old.edited):
+            entry = old.get(row)
+            target = rows.get(entry['url'])
+            if target is None:
+                lost += 1
+                continue
+            for key, value in entry.items():
+                self.set(target, key, value)
+            self.set_deleted(target, old.is_deleted(row))
+
+        for row in old.rows(new=True).tolist():
+            self.append(old.get(row), NEW, old.thumbnails.get(row))
+        return lost
+
+    @contextmanager
+    def transaction(self, label, data=None):
+        # The changes inside are one undo step, a nested transaction belongs to the outer one.
+        # data is kept with the step and returned by undo and redo, e.g. for state outside the store.
+        if self._log is not None:
+            yield
+            return
+
+        self._log = []
+        edited = set(self.edited)
+        try:
+            yield
+        finally:
+            log, self._log = self._log, None
+            if log or data:
+                self.undo_stack.append((label, log, data, edited))
+                del self.undo_stack[:-UNDO_STEPS]
+                self.redo_stack.clear()
+
+    def _apply(self, change):
+        # apply a logged change, returns its inverse
+        if change[0] == 'set':
+            row, key, value = change[1:]
+            inverse = ('set', row, key, self.value(row, key))
+            self.set(row, key, value)
+        elif change[0] == 'flags':
+            row, flags = change[1:]
+            inverse = ('flags', row, int(self.flags[row]))
+            self.flags[row] = flags
+        elif change[0] == 'truncate':
+            inverse = ('extend',) + self.truncate(change[1])
+        else:
+            entries, flags, thumbnails = change[1:]
+            rows = self.extend(entries, flags)
+            for offset, thumbnail in thumbnails.items():
+                self.thumbnails[rows[offset]] = thumbnail
+            inverse = ('truncate', rows.start)
+        return inverse
+
+    def _replay(self, log):
+        return [self._apply(change) for change in reversed(log)]
+
+    def undo(self):
+        # (label, data) of the undone transaction, None if there is nothing to undo
+        if not self.undo_stack:
+            return None
+        label, log, data, edited = self.undo_stack.pop()
+        self.redo_stack.append((label, self._replay(log), data, self.edited))
+        # replaying marks the rows as edited again, the set before the transaction is restored
+        self.edited = edited
+        return label, data
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        label, log, data, edited = self.redo_stack.pop()
+        self.undo_stack.append((label, self._replay(log), data, self.edited))
+        self.edited = edited
+        return label, data
+
+    def rows(self, new=None, deleted=False):
+        # row indices filtered by flags, None matches both states
+        flags = self.flags[:self._size]
+        mask = np.ones(self._size, bool)
+        if new is not None:
+            mask &= (flags & NEW).astype(bool) == new
+        if deleted is not None:
+            mask &= (flags & DELETED).astype(bool) == deleted
+        return np.nonzero(mask)[0]
+
+    def count(self):
+        return len(self.rows())
+
+    def _ranks(self):
+        # rank of every row by lower case name and of every category, cached until names or categories change
+        if self._sort_keys is None:
+            lower = [name.lower() for name in self.names]
+            name_rank = np.empty(self._size, np.int64)
+            name_rank[sorted(range(self._size), key=lower.__getitem__)] = np.arange(self._size)
+            category_rank = np.empty(len(self.categories), np.int64)
+            category_rank[sorted(range(len(self.categories)), key=lambda i: self.categories[i].lower())] = np.arange(len(self.categories))
+            self._sort_keys = (name_rank, category_rank)
+        return self._sort_keys
+
+    def sorted_rows(self, sorttype):
+        rows = self.rows()
+        if not len(rows):
+            return rows
+
+        name_rank, category_rank = self._ranks()
+        if sorttype == 'CATEGORY':
+            order = np.lexsort((name_rank[rows], category_rank[self.category_ids[rows]]))
+        elif sorttype == 'NEW':
+            order = np.lexsort((name_rank[rows], (self.flags[rows] & NEW) == 0))
+        elif sorttype in SORT_FIELDS:
+            # heaviest first, assets without cost at the end
+            field = SORT_FIELDS[sorttype]
+            values = np.fromiter((self.extras.get(row, {}).get('cost', {}).get(field, -1) for row in rows.tolist()), np.float64, len(rows))
+            order = np.lexsort((name_rank[rows], -values))
+        else:
+            order = np.argsort(name_rank[rows], kind='stable')
+        return rows[order]
+
+    def toc_entries(self):
+        return [self.get(row) for row in self.rows()]
+
+    def keys(self):
+        # names and hex hashes of the assets in the database, for duplicate checks
+        rows = self.rows()
+        names = {self.names[row] for row in rows}
+        data = self.hashes[rows].tobytes().hex()
+        hashes = {data[i:i + 2 * HASH_SIZE] for i in range(0, len(data), 2 * HASH_SIZE)}
+        return names, hashes
+
+    def find(self, name):
+        for row in self.rows():
+            if self.names[row] == name:
+                return row
+        return -1
+
+
+def file_key(path):
+    # (size, mtime) of a TOC file, None if it does not exist
+    try:
+        st = stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class CatalogCache:
+    # stores of the TOC files by path, valid as long as size and mtime of the file are unchanged
+    def __init__(self):
+        self.entries = {}
+
+    def lookup(self, path):
+        # the cached store of path, None if the file changed or was not loaded yet
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == file_key(path):
+            return entry[1]
+        return None
+
+    def insert(self, path, key, store):
+        # Cache store, loaded from path when it had the given file_key. The unsaved changes
+        # of the store cached before are carried over, returns the number of lost edits.
+        entry = self.entries.get(path)
+        lost = 0
+        if entry is not None and entry[1] is not store and entry[1].dirty():
+            lost = store.carry_edits(entry[1])
+        self.entries[path] = (key, store)
+        return lost
+
+    def forget(self, path):
+        # after the TOC file was written from its store, the next load reads it again
+        self.entries.pop(path, None)
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,228 @@
+# Preview thumbnail pipeline.
+#
+# The preview of the artist (the file clients already know, <type>/preview/<name>.jpg)
+# is left as it is. From it, square variants of fixed sizes are written as
+# progressive JPEG and WebP to <type>/preview/<size>/ and all previews of a
+# category are packed into sprite atlases under <type>/preview/atlas/<toc>/ with
+# an offset index, so a client can show a whole category with one download.
+#
+# Requires Pillow. Run from the scripts directory:
+#   python -m lol.thumbnails <repopath> [--jobs N] [--force]
+
+import argparse
+import json
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+from os import makedirs, replace
+from os.path import join, exists, getmtime, splitext
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+from .toc import version, toc_files, load_toc, preview_name
+
+VARIANT_SIZES = (256, 128)
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+ATLAS_DIR = 'atlas'
+ATLAS_INDEX = 'index.json'
+ATLAS_TILE = 128
+ATLAS_COLUMNS = 16
+ATLAS_ROWS = 16
+
+
+def available():
+    return Image is not None
+
+
+def variant_files(stem):
+    # files the pipeline writes for one asset, relative to the preview directory
+    files = []
+    for size in VARIANT_SIZES:
+        files.append(join(str(size), stem + '.jpg'))
+        files.append(join(str(size), stem + '.webp'))
+    return files
+
+
+def preview_files(stem):
+    # All preview files of one asset, the source preview and its variants
+    return [stem + '.jpg'] + variant_files(stem)
+
+
+def _save(img, path, format, **kwargs):
+    # write next to the target and rename, so a crash never leaves a half written preview
+    temp_path = path + '.tmp'
+    img.save(temp_path, format=format, **kwargs)
+    replace(temp_path, path)
+
+
+def _save_variants(img, directory, stem):
+    _save(img, join(directory, stem + '.jpg'), 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    _save(img, join(directory, stem + '.webp'), 'WEBP', quality=WEBP_QUALITY, method=4)
+
+
+def is_current(src, preview_dir, stem):
+    for filename in variant_files(stem):
+        path = join(preview_dir, filename)
+        if not exists(path) or getmtime(path) < getmtime(src):
+            return False
+    return True
+
+
+def make_thumbnails(src, preview_dir, stem, force=False):
+    # src is usually the source preview <stem>.jpg in preview_dir, it is only read
+    if not force and is_current(src, preview_dir, stem):
+        return stem, False
+
+    with Image.open(src) as img:
+        img = ImageOps.exif_transpose(img).convert('RGB')
+
+    for size in VARIANT_SIZES:
+        directory = join(preview_dir, str(size))
+        makedirs(directory, exist_ok=True)
+        _save_variants(ImageOps.fit(img, (size, size), Image.LANCZOS), directory, stem)
+
+    return stem, True
+
+
+def build_previews(jobs, preview_dir, workers=None, force=False):
+    # jobs: list of (source image, asset file stem)
+    if not available():
+        raise RuntimeError('Pillow is required for the thumbnail pipeline')
+
+    if workers == 1 or len(jobs) < 2:
+        return [make_thumbnails(src, preview_dir, stem, force) for (src, stem) in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(make_thumbnails, src, preview_dir, stem, force) for (src, stem) in jobs]
+        return [future.result() for future in futures]
+
+
+def _atlas_tile(preview_dir, stem):
+    # prefer the prescaled variant, fall back to the main preview
+    path = join(preview_dir, str(ATLAS_TILE), stem + '.jpg')
+    if not exists(path):
+        path = join(preview_dir, stem + '.jpg')
+    if not exists(path):
+        return None
+
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+        if img.size != (ATLAS_TILE, ATLAS_TILE):
+            img = ImageOps.fit(img, (ATLAS_TILE, ATLAS_TILE), Image.LANCZOS)
+        return img
+
+
+def _atlas_name(category, page):
+    name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in category)
+    return '{0}_{1}'.format(name, page)
+
+
+def atlas_dir(toc_filename):
+    # relative to the preview directory, one atlas set per TOC file
+    return join(ATLAS_DIR, splitext(toc_filename)[0])
+
+
+def build_atlases(assets, preview_dir, toc_filename):
+    # Pack all previews of a category into atlas pages of ATLAS_COLUMNS x ATLAS_ROWS tiles.
+    # Returns the index which is also written to atlas/<toc>/index.json:
+    # {category: {'tile': size, 'pages': [name, ...], 'assets': {url: [page, x, y]}}}
+    if not available():
+        raise RuntimeError('Pillow is required for the thumbnail pipeline')
+
+    directory = join(preview_dir, atlas_dir(toc_filename))
+    makedirs(directory, exist_ok=True)
+
+    categories = {}
+    for asset in sorted(assets, key=lambda c: c['name'].lower()):
+        categories.setdefault(asset['category'], []).append(asset)
+
+    per_page = ATLAS_COLUMNS * ATLAS_ROWS
+    index = {}
+    for category in sorted(categories):
+        tiles = []
+        for asset in categories[category]:
+            tile = _atlas_tile(preview_dir, splitext(asset['url'])[0])
+            if tile is not None:
+                tiles.append((asset['url'], tile))
+
+        entry = {'tile': ATLAS_TILE, 'pages': [], 'assets': {}}
+        for page in range(ceil(len(tiles) / per_page)):
+            page_tiles = tiles[page * per_page:(page + 1) * per_page]
+            rows = ceil(len(page_tiles) / ATLAS_COLUMNS)
+            columns = min(len(page_tiles), ATLAS_COLUMNS)
+            atlas = Image.new('RGB', (columns * ATLAS_TILE, rows * ATLAS_TILE))
+
+            for idx, (url, tile) in enumerate(page_tiles):
+                x = (idx % ATLAS_COLUMNS) * ATLAS_TILE
+                y = (idx // ATLAS_COLUMNS) * ATLAS_TILE
+                atlas.paste(tile, (x, y))
+                entry['assets'][url] = [page, x, y]
+
+            name = _atlas_name(category, page)
+            _save_variants(atlas, directory, name)
+            entry['pages'].append(name)
+
+        index[category] = entry
+
+    temp_path = join(directory, ATLAS_INDEX + '.tmp')
+    with open(temp_path, 'w') as file:
+        file.write(json.dumps(index, indent=2))
+    replace(temp_path, join(directory, ATLAS_INDEX))
+
+    return index
+
+
+def atlas_files(index, toc_filename):
+    directory = atlas_dir(toc_filename)
+    files = [join(directory, ATLAS_INDEX)]
+    for entry in index.values():
+        for name in entry['pages']:
+            files.append(join(directory, name + '.jpg'))
+            files.append(join(directory, name + '.webp'))
+    return files
+
+
+def update_repository(repopath, workers=None, force=False):
+    # Create the variants of all previews referenced by the TOCs and rebuild the atlases
+    for filename, typedir in toc_files.items():
+        assets = load_toc(join(repopath, version, filename))
+        if not assets:
+            continue
+        preview_dir = join(repopath, typedir, 'preview')
+
+        jobs = []
+        for asset in assets:
+            src = join(preview_dir, preview_name(asset['url']))
+            if exists(src):
+                jobs.append((src, splitext(asset['url'])[0]))
+
+        results = build_previews(jobs, preview_dir, workers, force)
+        print('{0}: {1} previews, {2} updated'.format(filename, len(results), len([r for r in results if r[1]])))
+
+        index = build_atlases(assets, preview_dir, filename)
+        print('{0}: {1} atlas pages'.format(filename, sum(len(e['pages']) for e in index.values())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Normalize LoL preview thumbnails and build sprite atlases')
+    parser.add_argument('repopath', help='LoL repository directory')
+    parser.add_argument('--jobs', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--force', action='store_true', help='regenerate previews even if they are up to date')
+    args = parser.parse_args(argv)
+
+    if not available():
+        print('Pillow is required: pip install Pillow')
+        return 1
+
+    update_repository(args.repopath, args.jobs, args.force)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
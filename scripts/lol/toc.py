@@ -0,0 +1,119 @@
+import json
+
+from json import JSONDecodeError
+
+from os.path import isfile, splitext
+
+version = 'v2.5'
+
+# TOC file -> asset directory inside the repository
+toc_files = {
+    'assets_model.json': 'model',
+    'assets_material.json': 'material',
+    'assets_model_blendermarket.json': 'model',
+}
+
+# TOC files of older releases in the repository root, still read by old clients
+legacy_toc_files = {
+    'assets_model.json': 'model',
+    'assets_material.json': 'material',
+    'assets_model_patreon.json': 'model',
+}
+
+# TOC files whose zips are distributed elsewhere, only the previews are in the repository
+external_tocs = ('assets_model_blendermarket.json', 'assets_model_patreon.json')
+
+
+def toc_paths():
+    # (path relative to the repository, asset directory) of every TOC file
+    paths = [(version + '/' + filename, typedir) for filename, typedir in toc_files.items()]
+    paths += list(legacy_toc_files.items())
+    return paths
+
+
+def toc_filename(asset_type, blendermarket=False):
+    if blendermarket:
+        return 'assets_model_blendermarket.json'
+    elif asset_type == 'MATERIAL':
+        return 'assets_material.json'
+    else:
+        return 'assets_model.json'
+
+
+def typepath(asset_type):
+    if asset_type == 'MATERIAL':
+        return 'material'
+    else:
+        return 'model'
+
+
+def preview_name(url):
+    return splitext(url)[0] + '.jpg'
+
+
+def load_toc(filepath):
+    if not isfile(filepath):
+        return []
+
+    with open(filepath) as file_handle:
+        return json.loads(file_handle.read())
+
+
+REQUIRED_FIELDS = ('name', 'url', 'category', 'hash')
+
+
+def _check_entry(entry, buffer, position):
+    if not isinstance(entry, dict):
+        raise JSONDecodeError('TOC entry is not an object', buffer, position)
+    missing = [field for field in REQUIRED_FIELDS if field not in entry]
+    if missing:
+        raise JSONDecodeError('TOC entry without {0}'.format(', '.join(missing)), buffer, position)
+
+
+def iter_toc(filepath, block_size=65536):
+    # the entries of a TOC file one by one, the file is read in blocks and never held in memory at once
+    if not isfile(filepath):
+        return
+
+    decoder = json.JSONDecoder()
+    with open(filepath, encoding='utf-8') as file_handle:
+        buffer = ''
+        position = 0
+        eof = False
+        # '[' before the first entry, then exactly one ',' between two entries
+        expected = '['
+        can_close = False
+        while True:
+            # skip whitespace and the separator before the next entry
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] == expected):
+                if buffer[position] == expected:
+                    can_close = expected == '['
+                    expected = None
+                position += 1
+
+            if position < len(buffer) and buffer[position] == ']' and can_close:
+                return
+            if position < len(buffer) and expected is not None:
+                raise JSONDecodeError("Expecting '{0}'".format(expected), buffer, position)
+            if position < len(buffer):
+                try:
+                    entry, end = decoder.raw_decode(buffer, position)
+                except JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # a complete object always ends with '}', no need to wait for more data
+                    _check_entry(entry, buffer, position)
+                    yield entry
+                    position = end
+                    expected = ','
+                    can_close = True
+                    continue
+
+            if eof:
+                raise JSONDecodeError('Unexpected end of TOC', buffer, position)
+            # at least as much as is pending, an entry larger than a block is not parsed over and over
+            data = file_handle.read(max(block_size, len(buffer) - position))
+            eof = not data
+            buffer = buffer[position:] + data
+            position = 0
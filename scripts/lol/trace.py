@@ -0,0 +1,140 @@
+# Stage timing for the asset management tool.
+#
+#   with trace.span('calc_hash') as span:
+#       hash = calc_hash(path)
+#       span.count(bytes=getsize(path))
+#
+# Spans nest per thread and carry counters (bytes, items, ...). While tracing is
+# disabled span() returns a shared no-op object, so instrumented code pays one
+# function call per stage. Recorded spans can be exported in the Chrome trace
+# event format (chrome://tracing, ui.perfetto.dev) or summarized per stage name.
+
+import json
+import threading
+
+from os import getpid
+from time import perf_counter_ns
+
+enabled = False
+_events = []
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def count(self, **counters):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self.depth = len(stack)
+        stack.append(self)
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *args):
+        end = perf_counter_ns()
+        _local.stack.pop()
+        event = {
+            'name': self.name,
+            'start': self.start,
+            'duration': end - self.start,
+            'depth': self.depth,
+            'tid': threading.get_ident(),
+            'args': self.args,
+        }
+        with _lock:
+            _events.append(event)
+        return False
+
+    def count(self, **counters):
+        for key, value in counters.items():
+            self.args[key] = self.args.get(key, 0) + value
+
+
+def span(name, **args):
+    if not enabled:
+        return NULL_SPAN
+    return _Span(name, args)
+
+
+def enable(flag=True):
+    global enabled
+    enabled = flag
+
+
+def reset():
+    with _lock:
+        del _events[:]
+
+
+def events():
+    with _lock:
+        return list(_events)
+
+
+def chrome_trace():
+    pid = getpid()
+    trace_events = []
+    for event in events():
+        trace_events.append({
+            'name': event['name'],
+            'ph': 'X',
+            'ts': event['start'] / 1000.0,
+            'dur': event['duration'] / 1000.0,
+            'pid': pid,
+            'tid': event['tid'],
+            'args': event['args'],
+        })
+    return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+
+def export_chrome_trace(filepath):
+    with open(filepath, 'w') as file:
+        file.write(json.dumps(chrome_trace()))
+
+
+def summary():
+    # [(name, calls, total ms, max ms, counters)] sorted by total time
+    stages = {}
+    for event in events():
+        name = event['name']
+        if name not in stages:
+            stages[name] = [0, 0, 0, {}]
+        stage = stages[name]
+        stage[0] += 1
+        stage[1] += event['duration']
+        stage[2] = max(stage[2], event['duration'])
+        for key, value in event['args'].items():
+            if isinstance(value, (int, float)):
+                stage[3][key] = stage[3].get(key, 0) + value
+
+    result = [(name, calls, total / 1e6, longest / 1e6, counters) for name, (calls, total, longest, counters) in stages.items()]
+    return sorted(result, key=lambda c: c[2], reverse=True)
+
+
+def format_counters(counters):
+    text = []
+    for key, value in sorted(counters.items()):
+        if key == 'bytes':
+            text.append('{0:.1f} MB'.format(value / 1024 ** 2))
+        else:
+            text.append('{0} {1}'.format(value, key))
+    return ', '.join(text)
@@ -0,0 +1,163 @@
+# Drop folder watcher for the asset intake.
+#
+# Reports .blend files in the drop folder and its category subdirectories which
+# were created or modified since the watcher started. On Linux inotify tells
+# which files changed, elsewhere the folder is polled. A file is only reported
+# once its size and mtime did not change for `settle` seconds, so blends which
+# are still being copied are not picked up half written.
+
+import ctypes
+import ctypes.util
+import struct
+import sys
+
+from os import O_NONBLOCK, read, close, scandir, stat
+from os.path import join, splitext, dirname, normpath
+from time import monotonic
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_ISDIR = 0x40000000
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watches = {}
+
+    def add_watch(self, path):
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        wd = self.libc.inotify_add_watch(self.fd, path.encode(sys.getfilesystemencoding()), mask)
+        if wd >= 0:
+            self.watches[wd] = path
+
+    def read_events(self):
+        # list of (path, is_dir), empty if nothing happened
+        events = []
+        while True:
+            try:
+                data = read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0').decode(sys.getfilesystemencoding())
+                offset += length
+                if wd in self.watches and name:
+                    events.append((join(self.watches[wd], name), bool(mask & IN_ISDIR)))
+
+    def close(self):
+        close(self.fd)
+
+
+def inotify_available():
+    return sys.platform.startswith('linux') and ctypes.util.find_library('c') is not None
+
+
+def _stat_key(path):
+    try:
+        st = stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class DropFolderWatcher:
+    def __init__(self, filepath, settle=2.0, extension='.blend', use_inotify=True):
+        self.filepath = normpath(filepath)
+        self.settle = settle
+        self.extension = extension
+        self.pending = {}  # path -> (stat key, time the key was first seen)
+
+        self.inotify = None
+        if use_inotify and inotify_available():
+            try:
+                self.inotify = Inotify()
+            except OSError:
+                self.inotify = None
+
+        if self.inotify is not None:
+            self.inotify.add_watch(self.filepath)
+            for entry in scandir(self.filepath):
+                if entry.is_dir():
+                    self.inotify.add_watch(entry.path)
+
+        # files already in the folder are not new, a full check of the path handles them
+        self.seen = self.scan()
+
+    def scan(self):
+        # the drop folder and its direct subdirectories, which are used as categories
+        files = {}
+        directories = [self.filepath] + [entry.path for entry in scandir(self.filepath) if entry.is_dir()]
+        for directory in directories:
+            for entry in scandir(directory):
+                if entry.is_file() and splitext(entry.name)[1] == self.extension:
+                    st = entry.stat()
+                    files[entry.path] = (st.st_size, st.st_mtime_ns)
+        return files
+
+    def _candidates(self):
+        if self.inotify is None:
+            current = self.scan()
+            return {path: key for path, key in current.items() if self.seen.get(path) != key}
+
+        candidates = {}
+        for path, is_dir in self.inotify.read_events():
+            if is_dir:
+                # new category directory, only one level deep like the full check
+                if dirname(path) == self.filepath:
+                    self.inotify.add_watch(path)
+                    for entry in scandir(path):
+                        if entry.is_file() and splitext(entry.name)[1] == self.extension:
+                            candidates[entry.path] = _stat_key(entry.path)
+            elif splitext(path)[1] == self.extension:
+                candidates[path] = _stat_key(path)
+
+        for path in self.pending:
+            if path not in candidates:
+                candidates[path] = _stat_key(path)
+
+        return {path: key for path, key in candidates.items() if key is not None and self.seen.get(path) != key}
+
+    def poll(self, now=None):
+        # paths of new or modified files which are complete
+        if now is None:
+            now = monotonic()
+
+        ready = []
+        candidates = self._candidates()
+        for path, key in candidates.items():
+            if path in self.pending and self.pending[path][0] == key:
+                if now - self.pending[path][1] >= self.settle:
+                    ready.append(path)
+            else:
+                self.pending[path] = (key, now)
+
+        for path in list(self.pending):
+            if path not in candidates:
+                del self.pending[path]
+
+        for path in ready:
+            self.acknowledge(path)
+        return sorted(ready)
+
+    def acknowledge(self, path):
+        # mark the current state of path as handled, e.g. for files written by the intake itself
+        self.pending.pop(path, None)
+        key = _stat_key(path)
+        if key is not None:
+            self.seen[path] = key
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
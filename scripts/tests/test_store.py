@@ -0,0 +1,27 @@
+import unittest
+
+from lol.store import CatalogStore
+
+ENTRY = {'name': 'Oak Table', 'url': 'Oak_Table.zip', 'category': 'Furniture', 'hash': '00' * 32,
+         'date': '2021-01-01', 'bbox_min': [0, 0, 0], 'bbox_max': [1, 1, 1]}
+
+
+class UndoTest(unittest.TestCase):
+    def test_undo_edit_restores_loaded_state(self):
+        store = CatalogStore.from_toc([dict(ENTRY)])
+        with store.transaction('Rename'):
+            store.set(0, 'name', 'Walnut Table')
+        self.assertTrue(store.dirty())
+
+        store.undo()
+        self.assertEqual(store.names[0], 'Oak Table')
+        self.assertFalse(store.dirty())
+        self.assertEqual(store.edited, set())
+
+        store.redo()
+        self.assertEqual(store.names[0], 'Walnut Table')
+        self.assertEqual(store.edited, {0})
+
+
+if __name__ == '__main__':
+    unittest.main()